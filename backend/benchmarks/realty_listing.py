@@ -0,0 +1,186 @@
+"""Сравнение отдачи объявлений: ORM-объекты через response_model против строк
+запроса с сериализацией в orjson. Страницы поиска сравниваются по времени, полный
+проход по объявлениям пользователя - по времени и пику памяти.
+
+    python -m benchmarks.realty_listing
+"""
+
+import asyncio
+import json
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import asdict
+from functools import partial
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import Row, Select, StaticPool, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import aliased
+
+from src.core.database import Base
+from src.fake_generators import RealtyFake
+from src.image.models import Image
+from src.realty.crud import REALTY_SHORT_COLUMNS, realty_crud
+from src.realty.models import Realty
+from src.realty.schemas import RealtySchemaCreate, RealtySchemaFilter, RealtySchemaShort
+from src.realty.serialization import (
+    REALTY_SHORT_FIELDS,
+    dump_realtys,
+    realtys_short_from_rows,
+)
+from src.user.models import User
+
+NUMBER_REALTYS = 10_000
+PAGE_SIZES = (20, 100)
+ROUNDS = 200
+SCAN_ROUNDS = 5
+
+# Поле ответа, которое FastAPI создаёт для response_model маршрута
+response_field = create_model_field(
+    name="Response_realtys",
+    type_=list[RealtySchemaShort],
+    mode="serialization",
+)
+
+# Титульное фото для response_model - сущность Image с position = 0, как в
+# исходной модели с joinedload
+TitleImage = aliased(Image, name="title_image")
+
+
+def with_title_image_entity(stmt: Select[Any]) -> Select[Any]:
+    """Запрос строк объявлений, где столбцы титульного фото заменены сущностью
+    Image. Фильтры, сортировка и limit запроса сохраняются"""
+    return stmt.with_only_columns(
+        *(getattr(Realty, name) for name in REALTY_SHORT_FIELDS), TitleImage
+    ).outerjoin(
+        TitleImage, and_(TitleImage.realty_id == Realty.id, TitleImage.position == 0)
+    )
+
+
+async def response_model_body(realtys: Sequence[Row[Any]]) -> bytes:
+    """Тело ответа, как его собирает FastAPI для response_model: валидация из
+    атрибутов, сериализация поля и json.dumps в JSONResponse"""
+    content = await serialize_response(field=response_field, response_content=realtys)
+    return bytes(JSONResponse(content).body)
+
+
+async def seed(session: AsyncSession) -> None:
+    """Заполнение БД активными объявлениями одного пользователя с одним фото"""
+    user = User(username="bench", hashed_password=b"", email="bench@mail.com", phone="")
+    session.add(user)
+    await session.commit()
+
+    realtys_in = [
+        RealtySchemaCreate(**asdict(RealtyFake(is_active=True, number_images=1)))
+        for _ in range(NUMBER_REALTYS)
+    ]
+    await realty_crud.create_many(session, realtys_in, user.id)
+
+
+async def measure(call: Callable[[], Awaitable[bytes]]) -> tuple[float, bytes]:
+    """Среднее время вызова в мс и тело последнего ответа"""
+    body = await call()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        body = await call()
+    return (time.perf_counter() - start) / ROUNDS * 1000, body
+
+
+def dump_realty_rows(rows: Sequence[Row[Any]]) -> bytes:
+    return dump_realtys(realtys_short_from_rows(rows))
+
+
+def measure_sync(call: Callable[[], bytes]) -> float:
+    """Среднее время синхронного вызова в мс"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        call()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+async def measure_scan(call: Callable[[], Awaitable[bytes]]) -> tuple[float, float]:
+    """Среднее время вызова в мс и пик выделенной за вызов памяти в МиБ. Память
+    считается отдельным прогоном: tracemalloc замедляет выполнение"""
+    await call()
+    start = time.perf_counter()
+    for _ in range(SCAN_ROUNDS):
+        await call()
+    elapsed_ms = (time.perf_counter() - start) / SCAN_ROUNDS * 1000
+
+    tracemalloc.start()
+    await call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024 / 1024
+
+
+async def main() -> None:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as session:
+        await seed(session)
+
+    for limit in PAGE_SIZES:
+        filter_query = RealtySchemaFilter(limit=limit, count="none")
+        rows_stmt = realty_crud.get_list_stmt(filter_query)
+        orm_stmt = with_title_image_entity(rows_stmt)
+
+        async def response_model_path(stmt: Select[Any] = orm_stmt) -> bytes:
+            async with session_factory() as session:
+                return await response_model_body((await session.execute(stmt)).all())
+
+        async def rows_path(stmt: Select[Any] = rows_stmt) -> bytes:
+            async with session_factory() as session:
+                return dump_realty_rows((await session.execute(stmt)).all())
+
+        old_ms, old_body = await measure(response_model_path)
+        new_ms, new_body = await measure(rows_path)
+        assert json.loads(old_body) == json.loads(new_body)
+        print(
+            f"limit={limit:>3} request:   response_model {old_ms:6.2f} ms, "
+            f"rows + orjson {new_ms:6.2f} ms, x{old_ms / new_ms:.1f}"
+        )
+
+        # Только сериализация уже загруженной страницы
+        async with session_factory() as session:
+            orm_rows = (await session.execute(orm_stmt)).all()
+            rows = (await session.execute(rows_stmt)).all()
+        old_ms, _ = await measure(partial(response_model_body, orm_rows))
+        new_ms = measure_sync(partial(dump_realty_rows, rows))
+        print(
+            f"limit={limit:>3} serialize: response_model {old_ms:6.2f} ms, "
+            f"rows + orjson {new_ms:6.2f} ms, x{old_ms / new_ms:.1f}"
+        )
+
+    # Полный проход по всем объявлениям пользователя
+    rows_scan_stmt = select(*REALTY_SHORT_COLUMNS).filter(Realty.user_id == 1)
+    orm_scan_stmt = with_title_image_entity(rows_scan_stmt)
+
+    async def response_model_scan() -> bytes:
+        async with session_factory() as session:
+            return await response_model_body(
+                (await session.execute(orm_scan_stmt)).all()
+            )
+
+    async def rows_scan() -> bytes:
+        async with session_factory() as session:
+            return dump_realty_rows((await session.execute(rows_scan_stmt)).all())
+
+    old_ms, old_mib = await measure_scan(response_model_scan)
+    new_ms, new_mib = await measure_scan(rows_scan)
+    print(
+        f"scan {NUMBER_REALTYS} rows:   response_model {old_ms:6.1f} ms "
+        f"{old_mib:5.1f} MiB, rows + orjson {new_ms:6.1f} ms {new_mib:5.1f} MiB"
+    )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
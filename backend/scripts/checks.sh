@@ -2,7 +2,7 @@
 
 set -x
 
-ruff format src tests
-ruff check --fix src tests
+ruff format src tests benchmarks
+ruff check --fix src tests benchmarks
 
-mypy src tests
\ No newline at end of file
+mypy src tests benchmarks
\ No newline at end of file
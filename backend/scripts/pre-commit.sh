@@ -1,9 +1,9 @@
 #!/bin/sh -e
 set -x
 
-ruff format src tests
-ruff check --fix src tests
+ruff format src tests benchmarks
+ruff check --fix src tests benchmarks
 
-mypy src tests
+mypy src tests benchmarks
 
 pytest -v tests
\ No newline at end of file
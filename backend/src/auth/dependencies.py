@@ -1,8 +1,12 @@
-from collections.abc import Callable, Coroutine
+import hashlib
+import hmac
+import time
+from collections.abc import AsyncGenerator, Callable, Coroutine
 from typing import Annotated, Any
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import (
+    HTTPAuthorizationCredentials,
     HTTPBearer,
     OAuth2PasswordBearer,
     OAuth2PasswordRequestForm,
@@ -12,9 +16,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.exceptions import EmailAlreadyExists, NotAuthenticated, PermissionDenied
 from src.auth.schemas import UserSchemaAccess, UserSchemaRefresh
-from src.auth.security import validate_password
+from src.auth.security import password_hasher
 from src.auth.utils import decode_jwt
-from src.core.database import get_session
+from src.config import settings
+from src.core.cache import TTLCache
+from src.core.database import (
+    get_read_session_factory,
+    get_session,
+    is_recent_writer,
+)
 from src.exceptions import NotFound
 from src.user.crud import user_crud
 from src.user.models import User
@@ -23,6 +33,13 @@ from src.user.schemas import UserSchemaCreate, UserSchemaUpdate
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/jwt/token", auto_error=False)
 http_bearer = HTTPBearer(auto_error=False)
 
+token_cache: TTLCache[tuple[bytes, type[UserSchemaRefresh]], UserSchemaRefresh] = (
+    TTLCache(
+        maxsize=settings.cache.TOKEN_CACHE_SIZE,
+        ttl=settings.cache.TOKEN_CACHE_TTL_SECONDS,
+    )
+)
+
 
 async def check_new_email_is_exists(
     user_in: UserSchemaCreate,
@@ -54,7 +71,9 @@ async def authenticate_user(
 ) -> User | None:
     """Аутентификация пользователя по email и паролю или вызов ошибки"""
     user = await user_crud.get_by_email(session, form_data.username)
-    if user and validate_password(form_data.password, user.hashed_password):
+    if user and await password_hasher.validate(
+        form_data.password, user.hashed_password
+    ):
         return user
 
     raise NotAuthenticated(detail="Invalid username or password")
@@ -74,6 +93,33 @@ def get_payload_from_token(
     return payload
 
 
+def get_user_info_from_token[SchemaType: (UserSchemaRefresh, UserSchemaAccess)](
+    token: str,
+    schema: type[SchemaType],
+) -> SchemaType:
+    """Получение проверенных данных пользователя из токена. Результат кэшируется по
+    дайджесту токена до истечения его срока, поэтому повторные запросы с тем же
+    токеном не проверяют подпись и не валидируют схему заново"""
+    if not token:
+        raise NotAuthenticated
+
+    key = (hashlib.sha256(token.encode()).digest(), schema)
+    cached_user_info = token_cache.get(key)
+    if isinstance(cached_user_info, schema):
+        return cached_user_info
+
+    payload: dict[str, Any] = get_payload_from_token(token)
+    try:
+        user_info = schema(**payload)
+    except ValueError as error:
+        raise NotAuthenticated from error
+
+    if (expire := payload.get("exp")) is not None:
+        token_cache.set(key, user_info, ttl=expire - time.time())
+
+    return user_info
+
+
 def get_current_user_from_token[SchemaType: (UserSchemaRefresh, UserSchemaAccess)](
     schema: type[SchemaType],
 ) -> Callable[[str, AsyncSession], Coroutine[Any, Any, User]]:
@@ -82,13 +128,11 @@ def get_current_user_from_token[SchemaType: (UserSchemaRefresh, UserSchemaAccess
         session: AsyncSession = Depends(get_session),
     ) -> User:
         """Фабричная функция получения текущего пользователя из токена"""
-        payload: dict[str, Any] = get_payload_from_token(token)
-        try:
-            current_user_info = schema(**payload)
-        except ValueError as error:
-            raise NotAuthenticated from error
+        current_user_info = get_user_info_from_token(token, schema)
+        current_user = await user_crud.get_cached(session, current_user_info.id)
+        if current_user is None:
+            raise NotFound(detail=f"User id={current_user_info.id} not found")
 
-        current_user: User = await get_user_by_id(current_user_info.id, session)
         return current_user
 
     return wrapper
@@ -113,6 +157,16 @@ async def get_current_user_or_none(
     return current_user
 
 
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия для GET-запросов: реплика, а для клиента, недавно изменявшего данные,
+    - основная БД. Клиент определяется по cookie без обращения к БД"""
+    read_your_writes = is_recent_writer(request.cookies)
+    async with get_read_session_factory(read_your_writes)() as session:
+        # Такие чтения не должны обслуживаться общими кэшами, заполняемыми из реплики
+        session.info["read_your_writes"] = read_your_writes
+        yield session
+
+
 async def get_user_by_id_for_current_user(
     current_user: User = Depends(get_current_user), user: User = Depends(get_user_by_id)
 ) -> User:
@@ -135,3 +189,19 @@ async def check_update_email_is_exists(
             raise EmailAlreadyExists
 
     return user_in
+
+
+def check_metrics_access(
+    credentials: HTTPAuthorizationCredentials | None = Depends(http_bearer),
+) -> None:
+    """Доступ к метрикам только по токену из настроек. Без токена в настройках
+    эндпоинт не существует"""
+    metrics_token = settings.security.METRICS_TOKEN
+    if metrics_token is None:
+        raise NotFound
+    if credentials is None:
+        raise NotAuthenticated
+    if not hmac.compare_digest(
+        credentials.credentials.encode(), metrics_token.encode()
+    ):
+        raise PermissionDenied
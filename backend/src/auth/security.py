@@ -1,5 +1,13 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
 import bcrypt
 
+from src.config import settings
+
 
 def hash_password(password: str) -> bytes:
     salt = bcrypt.gensalt()
@@ -13,3 +21,82 @@ def validate_password(
 ) -> bool:
     pwd_bytes = password.encode()
     return bcrypt.checkpw(pwd_bytes, hashed_password)
+
+
+class PasswordHasher:
+    """Выполнение bcrypt в ограниченном пуле потоков вне цикла событий. bcrypt
+    отпускает GIL, поэтому одновременные хеширования идут параллельно на ядрах"""
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество операций, ожидающих свободного потока"""
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        """Количество операций, выполняющихся прямо сейчас"""
+        return self._running
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "running": self.running,
+        }
+
+    async def hash(self, password: str) -> bytes:
+        return await self._run(hash_password, password)
+
+    async def validate(self, password: str, hashed_password: bytes) -> bool:
+        return await self._run(validate_password, password, hashed_password)
+
+    async def _run[**P, R](
+        self, func: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+    ) -> R:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="bcrypt"
+            )
+        with self._lock:
+            self._queued += 1
+
+        future = self._executor.submit(lambda: self._call(func, *args, **kwargs))
+        # Отменённая до запуска операция не попадает в _call и уходит из очереди здесь
+        future.add_done_callback(self._dequeue_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _dequeue_cancelled(self, future: Future[Any]) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def shutdown(self) -> None:
+        """Остановка пула потоков: ожидающие операции отменяются, выполняющиеся
+        завершаются"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _call[**P, R](
+        self, func: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+    ) -> R:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.security.PASSWORD_HASH_MAX_WORKERS
+)
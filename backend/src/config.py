@@ -1,5 +1,7 @@
+import os
 from pathlib import Path
 
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from src.constants import Environment
@@ -14,6 +16,29 @@ class BaseSettingsEnv(BaseSettings):
 class DbSettings(BaseSettingsEnv):
     DATABASE_URL: str = f"sqlite+aiosqlite:///{BASE_DIR}/test.db"
     ECHO_DB: bool = False
+    # Пул соединений на процесс: при N воркерах к БД открывается до
+    # N * (POOL_SIZE + POOL_MAX_OVERFLOW) соединений. Для SQLite в памяти не
+    # применяется - там одно общее соединение
+    POOL_SIZE: int = Field(default=5, gt=0)
+    POOL_MAX_OVERFLOW: int = Field(default=10, ge=0)
+    POOL_TIMEOUT_SECONDS: float = Field(default=30.0, gt=0)
+    POOL_RECYCLE_SECONDS: int = Field(default=1800, ge=-1)
+    POOL_PRE_PING: bool = True
+    # Кэш подготовленных выражений asyncpg; 0 - для pgbouncer в режиме transaction
+    ASYNCPG_STATEMENT_CACHE_SIZE: int = Field(default=100, ge=0)
+    # PRAGMA, выставляемые каждому новому соединению SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = Field(default=256 * 1024 * 1024, ge=0)
+    # Отрицательное значение - размер кэша страниц в КиБ
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000, ge=0)
+    # Реплика для чтения в GET-запросах; без неё чтение идёт в основную БД
+    READ_REPLICA_URL: str | None = None
+    # Сколько секунд после своего изменения клиент читает из основной БД
+    READ_YOUR_WRITES_SECONDS: float = Field(default=5.0, ge=0)
+    # Cookie клиента со временем его последнего изменения
+    READ_YOUR_WRITES_COOKIE: str = "last_write_at"
 
 
 class AuthJWT(BaseSettingsEnv):
@@ -23,10 +48,37 @@ class AuthJWT(BaseSettingsEnv):
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
 
 
+class Security(BaseSettingsEnv):
+    # Максимум одновременных bcrypt-операций (размер пула потоков)
+    PASSWORD_HASH_MAX_WORKERS: int = Field(
+        default_factory=lambda: os.cpu_count() or 1, gt=0
+    )
+    # Bearer-токен для /metrics; без него эндпоинт отключён
+    METRICS_TOKEN: str | None = None
+
+
+class Cache(BaseSettingsEnv):
+    # Кэш пользователей для get_current_user по id из токена
+    USER_CACHE_SIZE: int = Field(default=1024, ge=0)
+    USER_CACHE_TTL_SECONDS: int = Field(default=60, gt=0)
+    # Кэш проверенных токенов; запись живёт не дольше срока действия токена
+    TOKEN_CACHE_SIZE: int = Field(default=4096, ge=0)
+    TOKEN_CACHE_TTL_SECONDS: int = Field(default=3600, gt=0)
+    # Кэш ответов поиска объявлений для анонимных пользователей. Кэш у каждого
+    # процесса свой, TTL ограничивает устаревание ответов в других воркерах
+    LISTING_CACHE_SIZE: int = Field(default=512, ge=0)
+    LISTING_CACHE_TTL_SECONDS: int = Field(default=30, gt=0)
+
+
 class Cloudinary(BaseSettingsEnv):
     CLOUD_NAME: str = ""
     CLOUD_API_KEY: str = ""
     CLOUD_API_SECRET: str = ""
+    # Cloudinary удаляет не больше 100 фото за один вызов
+    DELETE_BATCH_SIZE: int = Field(default=100, gt=0, le=100)
+    DELETE_POLL_INTERVAL_SECONDS: float = Field(default=5.0, gt=0)
+    DELETE_MAX_ATTEMPTS: int = Field(default=10, gt=0)
+    DELETE_BACKOFF_SECONDS: float = Field(default=5.0, gt=0)
 
 
 class Settings(BaseSettingsEnv):
@@ -35,6 +87,8 @@ class Settings(BaseSettingsEnv):
 
     db: DbSettings = DbSettings()
     auth_jwt: AuthJWT = AuthJWT()
+    security: Security = Security()
+    cache: Cache = Cache()
     cloudinary: Cloudinary = Cloudinary()
 
 
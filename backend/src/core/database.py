@@ -1,11 +1,18 @@
+import math
 import re
-from collections.abc import AsyncGenerator
+import sqlite3
+import time
+from collections.abc import AsyncGenerator, Callable, Mapping
+from contextlib import suppress
 from datetime import UTC, datetime
-from typing import Annotated
+from typing import Annotated, Any
 
-from sqlalchemy import func
+from fastapi import Response
+from sqlalchemy import event, func, make_url
+from sqlalchemy.engine.interfaces import DBAPIConnection
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -13,16 +20,83 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
+    Session,
     declared_attr,
     mapped_column,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
-from src.config import settings
+from src.config import DbSettings, settings
 
-engine = create_async_engine(
-    url=settings.db.DATABASE_URL,
-    echo=settings.db.ECHO_DB,
-)
+
+def get_engine(db_settings: DbSettings, database_url: str | None = None) -> AsyncEngine:
+    """Создание движка с настройками пула под бэкенд: asyncpg или aiosqlite.
+    По умолчанию - для основной БД из DATABASE_URL"""
+    url = make_url(database_url or db_settings.DATABASE_URL)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    engine_kwargs: dict[str, Any] = {}
+    # SQLite в памяти работает через одно общее соединение, пул не настраивается
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        if is_sqlite:
+            # Для файла aiosqlite по умолчанию открывает соединение на каждый запрос
+            engine_kwargs["poolclass"] = AsyncAdaptedQueuePool
+        engine_kwargs.update(
+            pool_size=db_settings.POOL_SIZE,
+            max_overflow=db_settings.POOL_MAX_OVERFLOW,
+            pool_timeout=db_settings.POOL_TIMEOUT_SECONDS,
+            pool_recycle=db_settings.POOL_RECYCLE_SECONDS,
+            pool_pre_ping=db_settings.POOL_PRE_PING,
+        )
+    if url.get_driver_name() == "asyncpg":
+        # Кэш asyncpg и кэш подготовленных выражений диалекта SQLAlchemy
+        engine_kwargs["connect_args"] = {
+            "statement_cache_size": db_settings.ASYNCPG_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": db_settings.ASYNCPG_STATEMENT_CACHE_SIZE,
+        }
+
+    engine = create_async_engine(url, echo=db_settings.ECHO_DB, **engine_kwargs)
+    if is_sqlite:
+        event.listen(engine.sync_engine, "connect", _get_sqlite_pragmas(db_settings))
+        event.listen(engine.sync_engine.pool, "close", _optimize_sqlite)
+    return engine
+
+
+def _optimize_sqlite(
+    dbapi_connection: DBAPIConnection, connection_record: ConnectionPoolEntry
+) -> None:
+    """Сбор статистики по индексам, которые использовало соединение. Без неё
+    планировщик SQLite выбирает между индексами по порядку их объявления"""
+    # Событие close приходит и для сломанных соединений, закрытие не прерываем
+    with suppress(sqlite3.Error):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA optimize")
+        cursor.close()
+
+
+def _get_sqlite_pragmas(
+    db_settings: DbSettings,
+) -> Callable[[DBAPIConnection, ConnectionPoolEntry], None]:
+    """Обработчик подключения, выставляющий PRAGMA новому соединению SQLite"""
+    pragmas = {
+        "journal_mode": db_settings.SQLITE_JOURNAL_MODE,
+        "synchronous": db_settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": db_settings.SQLITE_MMAP_SIZE,
+        "cache_size": db_settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": db_settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+    def set_sqlite_pragmas(
+        dbapi_connection: DBAPIConnection, connection_record: ConnectionPoolEntry
+    ) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return set_sqlite_pragmas
+
+
+engine = get_engine(settings.db)
 session_factory = async_sessionmaker(
     bind=engine,
     autocommit=False,
@@ -30,13 +104,92 @@ session_factory = async_sessionmaker(
     expire_on_commit=False,
 )
 
+read_engine = (
+    get_engine(settings.db, settings.db.READ_REPLICA_URL)
+    if settings.db.READ_REPLICA_URL
+    else engine
+)
+read_session_factory = async_sessionmaker(
+    bind=read_engine,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+class ReadYourWritesTracker:
+    """Отметка о последнем изменении данных клиентом. Время изменения хранится у
+    клиента в короткоживущей cookie, поэтому её проверяет любой воркер приложения.
+    Подделанная отметка лишь отправляет чтения клиента в основную БД"""
+
+    def __init__(self, cookie_name: str, window_seconds: float) -> None:
+        self.cookie_name = cookie_name
+        self.window_seconds = window_seconds
+
+    def mark(self, response: Response) -> None:
+        """Запись времени изменения в cookie ответа"""
+        if self.window_seconds <= 0:
+            return
+
+        response.set_cookie(
+            self.cookie_name,
+            f"{time.time():.3f}",
+            max_age=math.ceil(self.window_seconds),
+            httponly=True,
+            samesite="lax",
+        )
+
+    def is_recent(self, cookies: Mapping[str, str]) -> bool:
+        """Клиент изменял данные не раньше window_seconds назад, и реплика могла их
+        ещё не получить"""
+        try:
+            written_at = float(cookies.get(self.cookie_name, ""))
+        except ValueError:
+            return False
+
+        return abs(time.time() - written_at) < self.window_seconds
+
+
+read_your_writes = ReadYourWritesTracker(
+    cookie_name=settings.db.READ_YOUR_WRITES_COOKIE,
+    window_seconds=settings.db.READ_YOUR_WRITES_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def mark_recent_writer(session: Session) -> None:
+    """Отметка клиента после коммита. Ответ на запрос кладёт в session.info
+    get_session"""
+    if (response := session.info.get("response")) is not None:
+        read_your_writes.mark(response)
+
+
+def is_recent_writer(cookies: Mapping[str, str]) -> bool:
+    """Клиент недавно изменял данные, и реплика могла их ещё не получить"""
+    return read_your_writes.is_recent(cookies)
+
+
+def get_read_session_factory(
+    read_your_writes: bool,
+) -> async_sessionmaker[AsyncSession]:
+    """Фабрика сессий для чтения: реплика, либо основная БД для чтения своих
+    изменений"""
+    if read_your_writes:
+        return session_factory
+    return read_session_factory
+
+
 created_at = Annotated[
     datetime,
-    mapped_column(default=datetime.now(tz=UTC), server_default=func.now()),
+    mapped_column(default=lambda: datetime.now(tz=UTC), server_default=func.now()),
 ]
 updated_at = Annotated[
     datetime,
-    mapped_column(default=datetime.now(tz=UTC), server_default=func.now()),
+    mapped_column(
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
+        server_default=func.now(),
+    ),
 ]
 
 
@@ -62,6 +215,8 @@ class Base(AsyncAttrs, DeclarativeBase):
         return f"<{self.__class__.__name__} {', '.join(cols)}>"
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_session(response: Response) -> AsyncGenerator[AsyncSession, None]:
     async with session_factory() as session:
+        # Коммит сессии отметит клиента для чтения своих изменений
+        session.info["response"] = response
         yield session
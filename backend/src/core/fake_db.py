@@ -47,6 +47,7 @@ class FakeDB:
         print("->   add_realtys...")
 
         async with self._session_factory() as session:
+            realtys: list[Realty] = []
             for _ in range(self.NUMBER_REALTYS):
                 user_id = randint(1, self.NUMBER_USERS)
                 number_images = randint(0, self.MAX_NUMBER_IMAGES)
@@ -63,6 +64,10 @@ class FakeDB:
                 realty.images = images
 
                 session.add(realty)
+                realtys.append(realty)
+            await session.flush()
+            for realty in realtys:
+                realty.sync_images()
             await session.commit()
 
     async def _add_follows(self) -> None:
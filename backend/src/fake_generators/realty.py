@@ -26,6 +26,8 @@ class RealtyFake:
     state: str = field(default_factory=fake.state)
     type: RealtyType = field(default_factory=fake.realty_type)
     is_active: bool = True
+    latitude: float | None = field(default_factory=lambda: float(fake.latitude()))
+    longitude: float | None = field(default_factory=lambda: float(fake.longitude()))
     number_images: InitVar[int] = 5
     images: list[ImageFake] = field(default_factory=list)
 
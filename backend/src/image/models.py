@@ -1,15 +1,21 @@
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from src.core.database import Base
+from src.core.database import Base, created_at
 
 if TYPE_CHECKING:
     from src.realty.models import Realty
 
 
 class Image(Base):
+    __table_args__ = (
+        # Титульное фото (position = 0), фото объявления по порядку и with_photos
+        Index("ix_images_realty_id_position", "realty_id", "position"),
+    )
+
     url: Mapped[str]
     public_id: Mapped[str]
     position: Mapped[int]
@@ -18,3 +24,18 @@ class Image(Base):
     realty: Mapped["Realty"] = relationship(back_populates="images")
 
     repr_cols = ("id",)
+
+
+class ImageDeletion(Base):
+    """Outbox удалений фото с Cloudinary: запись добавляется в той же транзакции,
+    что и изменение объявления, а удаляет фото фоновый ImageDeletionWorker"""
+
+    public_id: Mapped[str]
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        default=lambda: datetime.now(tz=UTC), index=True
+    )
+    last_error: Mapped[str | None]
+    created_at: Mapped[created_at]
+
+    repr_cols = ("attempts", "next_attempt_at")
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import Result, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import settings
+from src.core.database import session_factory
+from src.image.models import ImageDeletion
+from src.image.services import delete_images
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDeletionWorker:
+    """Фоновое удаление фото с Cloudinary по записям outbox. Фото удаляются пачками
+    не больше лимита Cloudinary на один вызов, неудачные попытки повторяются
+    с экспоненциальной задержкой"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = session_factory,
+        delete_images: Callable[[list[str]], None] = delete_images,
+        batch_size: int = settings.cloudinary.DELETE_BATCH_SIZE,
+        poll_interval: float = settings.cloudinary.DELETE_POLL_INTERVAL_SECONDS,
+        max_attempts: int = settings.cloudinary.DELETE_MAX_ATTEMPTS,
+        backoff: timedelta = timedelta(
+            seconds=settings.cloudinary.DELETE_BACKOFF_SECONDS
+        ),
+        max_backoff: timedelta = timedelta(hours=1),
+    ) -> None:
+        self._session_factory = session_factory
+        self._delete_images = delete_images
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    async def run(self) -> None:
+        """Бесконечная обработка outbox, пока задача не будет отменена"""
+        while True:
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Failed to process image deletions")
+                processed = 0
+            # Полная пачка означает, что в outbox могут остаться готовые записи
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def process_batch(self) -> int:
+        """Обработка одной пачки готовых к удалению фото; возвращает её размер"""
+        now = datetime.now(tz=UTC)
+        async with self._session_factory() as session:
+            stmt = (
+                select(ImageDeletion)
+                .filter(
+                    ImageDeletion.next_attempt_at <= now,
+                    ImageDeletion.attempts < self.max_attempts,
+                )
+                .order_by(ImageDeletion.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result: Result[tuple[ImageDeletion]] = await session.execute(stmt)
+            deletions = result.scalars().all()
+            if not deletions:
+                return 0
+
+            public_ids = [deletion.public_id for deletion in deletions]
+            try:
+                # HTTP-запрос к Cloudinary блокирующий, поэтому выполняем его в потоке
+                await asyncio.to_thread(self._delete_images, public_ids)
+            except Exception as error:
+                logger.warning("Failed to delete images %s: %r", public_ids, error)
+                for deletion in deletions:
+                    deletion.attempts += 1
+                    deletion.next_attempt_at = now + self._get_backoff(
+                        deletion.attempts
+                    )
+                    deletion.last_error = repr(error)
+            else:
+                deletion_ids = [deletion.id for deletion in deletions]
+                await session.execute(
+                    delete(ImageDeletion).filter(ImageDeletion.id.in_(deletion_ids))
+                )
+            await session.commit()
+
+        return len(deletions)
+
+    def _get_backoff(self, attempts: int) -> timedelta:
+        factor: int = 2 ** (attempts - 1)
+        return min(self.backoff * factor, self.max_backoff)
+
+
+image_deletion_worker = ImageDeletionWorker()
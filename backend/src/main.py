@@ -1,11 +1,37 @@
-from fastapi import FastAPI
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.auth.dependencies import check_metrics_access, token_cache
+from src.auth.security import password_hasher
 from src.auth.views import router as router_auth
+from src.config import settings
+from src.image.outbox import image_deletion_worker
+from src.realty.cache import listing_cache
 from src.realty.views import router as router_realty
+from src.user.crud import user_cache
 from src.user.views import router as router_user
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    if settings.ENVIRONMENT.is_testing:
+        yield
+    else:
+        worker_task = asyncio.create_task(image_deletion_worker.run())
+        yield
+        worker_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await worker_task
+
+    # Пул потоков bcrypt создаётся при первом хешировании
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(router_realty, prefix="/realtys")
 app.include_router(router_auth, prefix="/auth/jwt")
@@ -22,7 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["x-total-count"],
+    expose_headers=["x-total-count", "x-next-cursor"],
 )
 
 
@@ -31,6 +57,18 @@ async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get(
+    "/metrics", include_in_schema=False, dependencies=[Depends(check_metrics_access)]
+)
+async def metrics() -> dict[str, dict[str, int]]:
+    return {
+        "password_hasher": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "listing_cache": listing_cache.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, cast
+
+from sqlalchemy import CursorResult, Result, ScalarSelect, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.core.database import session_factory
+from src.image.models import Image
+from src.realty.models import Realty
+
+
+async def backfill_image_count(session: AsyncSession) -> int:
+    """Пересчёт количества фото всех объявлений одним запросом. Возвращает
+    количество исправленных объявлений"""
+    image_count = (
+        select(func.count(Image.id))
+        .filter(Image.realty_id == Realty.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Realty)
+        .filter(Realty.image_count != image_count)
+        .values(image_count=image_count)
+        .execution_options(synchronize_session=False)
+    )
+    # UPDATE возвращает CursorResult, но AsyncSession.execute типизирован как Result
+    result: Result[Any] = await session.execute(stmt)
+    await session.commit()
+
+    return int(cast(CursorResult[Any], result).rowcount)
+
+
+async def backfill_title_image(session: AsyncSession) -> int:
+    """Заполнение столбцов титульного фото объявлений по фото с position = 0.
+    Возвращает количество исправленных объявлений"""
+
+    def title_image_column(column: InstrumentedAttribute[Any]) -> ScalarSelect[Any]:
+        return (
+            select(column)
+            .filter(Image.realty_id == Realty.id, Image.position == 0)
+            .scalar_subquery()
+        )
+
+    stmt = (
+        update(Realty)
+        .filter(
+            Realty.title_image_id.is_distinct_from(title_image_column(Image.id))
+            | Realty.title_image_url.is_distinct_from(title_image_column(Image.url))
+            | Realty.title_image_public_id.is_distinct_from(
+                title_image_column(Image.public_id)
+            )
+        )
+        .values(
+            title_image_id=title_image_column(Image.id),
+            title_image_url=title_image_column(Image.url),
+            title_image_public_id=title_image_column(Image.public_id),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result: Result[Any] = await session.execute(stmt)
+    await session.commit()
+
+    return int(cast(CursorResult[Any], result).rowcount)
+
+
+async def main() -> None:
+    async with session_factory() as session:
+        print(f"->   image_count: {await backfill_image_count(session)} realtys")
+        print(f"->   title_image: {await backfill_title_image(session)} realtys")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
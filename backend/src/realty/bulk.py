@@ -0,0 +1,125 @@
+from collections.abc import AsyncIterator, Sequence
+from typing import IO, Any, cast
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.realty.constants import BULK_IMPORT_CHUNK_SIZE, BULK_IMPORT_MAX_LINE_SIZE
+from src.realty.crud import realty_crud
+from src.realty.schemas import RealtySchemaCreate, RealtySchemaImportResult
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_size: int,
+) -> AsyncIterator[tuple[int, bytes | None]]:
+    """Построчное чтение потока NDJSON с номерами строк, пустые строки пропускаются.
+    Вместо строки длиннее max_line_size возвращается None: её остаток до перевода
+    строки не накапливается, поэтому память ограничена независимо от потока"""
+    line_number = 0
+    buffer = bytearray()
+    is_too_long = False
+    async for chunk in chunks:
+        # Перевод строки ищется только в новом чанке, а не во всём буфере
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            part = chunk[start:] if end == -1 else chunk[start:end]
+            if not is_too_long:
+                if len(buffer) + len(part) > max_line_size:
+                    is_too_long = True
+                    buffer.clear()
+                else:
+                    buffer += part
+            if end == -1:
+                break
+
+            line_number += 1
+            if is_too_long:
+                yield line_number, None
+            elif buffer.strip():
+                yield line_number, bytes(buffer)
+            buffer.clear()
+            is_too_long = False
+            start = end + 1
+
+    if is_too_long:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+async def import_realtys(
+    session: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    user_id: int,
+    results: IO[bytes],
+) -> None:
+    """Импорт объявлений из потока NDJSON пачками по BULK_IMPORT_CHUNK_SIZE.
+    Результат каждой строки пишется в results по мере обработки: ошибки валидации
+    сразу, созданные объявления - после вставки их пачки"""
+    batch: list[tuple[int, RealtySchemaCreate]] = []
+    async for line_number, line in iter_ndjson_lines(chunks, BULK_IMPORT_MAX_LINE_SIZE):
+        if line is None:
+            errors = [
+                {
+                    "type": "line_too_long",
+                    "msg": f"Line is longer than {BULK_IMPORT_MAX_LINE_SIZE} bytes",
+                }
+            ]
+            _write_result(
+                results, RealtySchemaImportResult(line=line_number, errors=errors)
+            )
+            continue
+
+        try:
+            realty_in = RealtySchemaCreate.model_validate_json(line)
+        except ValidationError as error:
+            errors = cast(
+                list[dict[str, Any]],
+                error.errors(
+                    include_url=False, include_context=False, include_input=False
+                ),
+            )
+            _write_result(
+                results, RealtySchemaImportResult(line=line_number, errors=errors)
+            )
+            continue
+
+        batch.append((line_number, realty_in))
+        if len(batch) == BULK_IMPORT_CHUNK_SIZE:
+            await _import_batch(session, batch, user_id, results)
+            batch.clear()
+
+    if batch:
+        await _import_batch(session, batch, user_id, results)
+
+
+async def _import_batch(
+    session: AsyncSession,
+    batch: Sequence[tuple[int, RealtySchemaCreate]],
+    user_id: int,
+    results: IO[bytes],
+) -> None:
+    line_numbers = [line_number for line_number, _ in batch]
+    try:
+        realty_ids = await realty_crud.create_many(
+            session, [realty_in for _, realty_in in batch], user_id
+        )
+    except IntegrityError as error:
+        # Пачка не вставлена целиком, предыдущие пачки уже сохранены
+        await session.rollback()
+        errors = [{"type": "integrity_error", "msg": str(error.orig)}]
+        for line_number in line_numbers:
+            _write_result(
+                results, RealtySchemaImportResult(line=line_number, errors=errors)
+            )
+        return
+
+    for line_number, realty_id in zip(line_numbers, realty_ids, strict=True):
+        _write_result(results, RealtySchemaImportResult(line=line_number, id=realty_id))
+
+
+def _write_result(results: IO[bytes], result: RealtySchemaImportResult) -> None:
+    results.write(result.model_dump_json(exclude_none=True).encode() + b"\n")
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Any
+
+from src.config import settings
+from src.core.cache import TTLCache
+from src.realty.schemas import RealtySchemaFilter
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Готовое к отправке тело ответа вместе с заголовками пагинации. Объявления
+    страницы хранятся для подстановки признака избранного пользователя"""
+
+    body: bytes
+    headers: dict[str, str]
+    realtys: list[dict[str, Any]]
+
+
+class ListingCache:
+    """Кэш сериализованных ответов поиска объявлений. Ключ - канонический фильтр
+    и версия каталога. Версия своя у каждого процесса: изменение объявлений сразу
+    сбрасывает кэш только процесса, выполнившего запись, а в остальных воркерах
+    устаревание ответа ограничено TTL (LISTING_CACHE_TTL_SECONDS)"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.version = 0
+        self._cache: TTLCache[tuple[int, str], CachedResponse] = TTLCache(maxsize, ttl)
+
+    def make_key(self, filter_query: RealtySchemaFilter) -> tuple[int, str]:
+        return self.version, filter_query.model_dump_json()
+
+    def get(self, key: tuple[int, str]) -> CachedResponse | None:
+        return self._cache.get(key)
+
+    def set(self, key: tuple[int, str], cached_response: CachedResponse) -> None:
+        self._cache.set(key, cached_response)
+
+    def bump_version(self) -> None:
+        self.version += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"version": self.version, **self._cache.stats()}
+
+
+listing_cache = ListingCache(
+    maxsize=settings.cache.LISTING_CACHE_SIZE,
+    ttl=settings.cache.LISTING_CACHE_TTL_SECONDS,
+)
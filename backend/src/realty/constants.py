@@ -0,0 +1,25 @@
+from typing import Final
+
+# Максимальное количество объявлений, до которого идёт подсчёт в режиме count=capped
+TOTAL_COUNT_CAP: Final[int] = 10_000
+
+# Количество объявлений, вставляемых одной пачкой при массовом импорте
+BULK_IMPORT_CHUNK_SIZE: Final[int] = 500
+
+# Максимальная длина строки NDJSON при импорте, более длинная строка пропускается
+BULK_IMPORT_MAX_LINE_SIZE: Final[int] = 64 * 1024
+
+# Размер результатов импорта в памяти, после которого они пишутся во временный файл
+BULK_IMPORT_RESULTS_SPOOL_SIZE: Final[int] = 1024 * 1024
+
+# Количество строк, получаемых из серверного курсора за раз при экспорте
+EXPORT_YIELD_PER: Final[int] = 1000
+
+# Размер буфера CSV, после которого он отдаётся клиенту
+EXPORT_CSV_BUFFER_SIZE: Final[int] = 64 * 1024
+
+# Количество ячеек сетки кластеров по стороне тайла карты
+CLUSTER_CELLS_PER_TILE: Final[int] = 8
+
+# Максимальное количество ячеек сетки в прямоугольнике карты при кластеризации
+CLUSTER_MAX_CELLS: Final[int] = 10_000
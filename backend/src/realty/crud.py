@@ -1,20 +1,77 @@
-from typing import cast
-
-from sqlalchemy import Result, Select, asc, case, desc, func, select
+from collections.abc import AsyncIterator, Sequence
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from sqlalchemy import (
+    ColumnElement,
+    Result,
+    Row,
+    RowMapping,
+    Select,
+    asc,
+    delete,
+    desc,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import Insert as PostgreSQLInsert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import Insert as SQLiteInsert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, noload, selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
-from src.image.models import Image
+from src.image.models import Image, ImageDeletion
 from src.image.schemas import ImageSchemaUpdate
-from src.image.services import delete_images
+from src.realty.cache import listing_cache
+from src.realty.constants import (
+    CLUSTER_CELLS_PER_TILE,
+    EXPORT_YIELD_PER,
+    TOTAL_COUNT_CAP,
+)
+from src.realty.geo import (
+    get_cluster_cell,
+    get_cluster_cell_size,
+    get_distance_km_sq,
+    get_radius_bbox,
+    realty_in_bbox,
+)
 from src.realty.models import Realty, UserRealtyFavorite
 from src.realty.schemas import (
+    RealtySchemaClusterFilter,
     RealtySchemaCreate,
+    RealtySchemaExport,
+    RealtySchemaFavoritesFilter,
     RealtySchemaFilter,
+    RealtySchemaPagination,
+    RealtySchemaSearch,
     RealtySchemaUpdate,
+    RealtySchemaUserFilter,
+    TotalCountMode,
+)
+from src.realty.search import (
+    TRIGRAM_MIN_LENGTH,
+    normalize_city,
+    realty_city_match,
+    realty_text_match,
+    realty_text_rank,
+)
+from src.realty.serialization import REALTY_SHORT_FIELDS
+from src.realty.utils import RealtyPage, decode_cursor
+
+# Столбцы карточки объявления в списке: поля RealtySchemaShort, титульное фото и
+# дата создания для курсора
+REALTY_SHORT_COLUMNS = (
+    *(getattr(Realty, name) for name in REALTY_SHORT_FIELDS),
+    Realty.title_image_id,
+    Realty.title_image_url,
+    Realty.title_image_public_id,
+    Realty.created_at,
 )
-
-# T = TypeVar("T", Realty, int, tuple[Realty, bool])
 
 
 class CRUDRealty:
@@ -27,7 +84,6 @@ class CRUDRealty:
             .options(
                 selectinload(Realty.images),
                 joinedload(Realty.user),
-                noload(Realty.title_image),
             )
         )
         result: Result[tuple[Realty]] = await session.execute(stmt)
@@ -35,56 +91,76 @@ class CRUDRealty:
 
         return realty
 
+    @staticmethod
+    async def get_version(session: AsyncSession, realty_id: int) -> Row[Any] | None:
+        """Версия объявления без загрузки самого объявления: время изменения,
+        количество фото и контрольная сумма их id с позициями"""
+        stmt = (
+            select(
+                Realty.update_at,
+                func.count(Image.id).label("image_count"),
+                func.coalesce(func.sum(Image.id * (Image.position + 1)), 0).label(
+                    "image_checksum"
+                ),
+            )
+            .outerjoin(Image, Image.realty_id == Realty.id)
+            .filter(Realty.id == realty_id)
+            .group_by(Realty.id)
+        )
+        result: Result[tuple[datetime, int, int]] = await session.execute(stmt)
+        version = result.one_or_none()
+
+        return version
+
     async def get_list(
         self,
         session: AsyncSession,
         filter_query: RealtySchemaFilter = RealtySchemaFilter(),
-    ) -> list[Realty]:
-        """Получение списка объявлений по заданному фильтру"""
-        stmt = select(Realty).options(joinedload(Realty.title_image))
-
-        stmt = self._applying_search_filters(stmt, filter_query)
-        stmt = self._applying_offset_limit_order_filters(stmt, filter_query)
+    ) -> RealtyPage[Row[Any]]:
+        """Получение страницы объявлений по заданному фильтру вместе с общим
+        количеством объявлений за один запрос"""
+        return await self._get_page(
+            session,
+            self.get_list_stmt(filter_query),
+            self._get_count_stmt(filter_query),
+            filter_query,
+            filter_query.count,
+        )
 
-        result: Result[tuple[Realty]] = await session.execute(stmt)
-        realtys = result.scalars().all()
+    def get_list_stmt(self, filter_query: RealtySchemaFilter) -> Select[Any]:
+        """Запрос страницы объявлений по фильтру. Выбираются только столбцы
+        карточки объявления, без загрузки ORM-объектов в сессию"""
+        stmt = self._applying_search_filters(
+            select(*REALTY_SHORT_COLUMNS), filter_query
+        )
 
-        return list(realtys)
+        return self._applying_page(
+            stmt,
+            self._get_count_stmt(filter_query),
+            filter_query,
+            self._get_field_order(filter_query),
+            filter_query.count,
+        )
 
-    async def get_list_with_is_favorite(
+    async def stream_list(
         self,
         session: AsyncSession,
-        user_id: int,
-        filter_query: RealtySchemaFilter = RealtySchemaFilter(),
-    ) -> list[Realty]:
-        """Получение списка объявлений по заданному фильтру с данными о том, являются
-        ли объявления избранными для текущего пользователя"""
-
+        filter_query: RealtySchemaSearch,
+    ) -> AsyncIterator[Row[Any]]:
+        """Потоковое получение всех объявлений по фильтру без limit/offset через
+        серверный курсор. Строки содержат только столбцы RealtySchemaExport"""
         stmt = select(
-            Realty,
-            case((UserRealtyFavorite.user_id.isnot(None), True), else_=False).label(
-                "is_favorite"
-            ),
-        ).outerjoin(
-            UserRealtyFavorite,
-            (
-                (UserRealtyFavorite.realty_id == Realty.id)
-                & (UserRealtyFavorite.user_id == user_id)
-            ),
+            *(getattr(Realty, name) for name in RealtySchemaExport.model_fields)
         )
-
         stmt = self._applying_search_filters(stmt, filter_query)
-        stmt = self._applying_offset_limit_order_filters(stmt, filter_query)
-
-        result: Result[tuple[Realty, bool]] = await session.execute(stmt)
-
-        realtys: list[Realty] = []
-        for row in result.all():
-            realty, is_favorite = row
-            realty.is_favorite = is_favorite
-            realtys.append(realty)
+        order = desc if filter_query.desc_order else asc
+        stmt = stmt.order_by(
+            order(self._get_field_order(filter_query)), order(Realty.id)
+        ).execution_options(yield_per=EXPORT_YIELD_PER)
 
-        return realtys
+        result = await session.stream(stmt)
+        async for row in result:
+            yield row
 
     async def get_count_list(
         self,
@@ -92,30 +168,49 @@ class CRUDRealty:
         filter_query: RealtySchemaFilter = RealtySchemaFilter(),
     ) -> int:
         """Получение количества объявлений для поискового фильтра"""
-        stmt = select(func.count()).select_from(Realty)
-        stmt = self._applying_search_filters(stmt, filter_query)
+        stmt = self._get_count_stmt(filter_query)
         result: Result[tuple[int]] = await session.execute(stmt)
         total = cast(int, result.scalar())
 
         return total
 
-    @staticmethod
-    async def get_favorites(session: AsyncSession, user_id: int) -> list[Realty]:
+    async def get_favorites(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        filter_query: RealtySchemaFavoritesFilter = RealtySchemaFavoritesFilter(),
+    ) -> RealtyPage[Row[Any]]:
+        """Получение страницы избранных объявлений пользователя вместе с их
+        количеством. Строки содержат столбцы карточки и время добавления"""
         stmt = (
-            select(Realty)
+            select(
+                *REALTY_SHORT_COLUMNS,
+                UserRealtyFavorite.created_at.label("favorited_at"),
+            )
             .join(UserRealtyFavorite)
             .filter(
                 UserRealtyFavorite.user_id == user_id,
                 Realty.is_active,
             )
         )
-        result: Result[tuple[Realty]] = await session.execute(stmt)
-        favorites = result.scalars().all()
-
-        return list(favorites)
+        field_order: ColumnElement[Any]
+        if filter_query.order_by == "favorited_at":
+            field_order = UserRealtyFavorite.created_at.expression
+        else:
+            field_order = getattr(Realty, filter_query.order_by)
+
+        count_stmt = self._get_count_favorites_stmt(user_id)
+
+        return await self._get_page(
+            session,
+            self._applying_page(stmt, count_stmt, filter_query, field_order),
+            count_stmt,
+            filter_query,
+        )
 
     @staticmethod
-    async def get_count_favorites(session: AsyncSession, user_id: int) -> int:
+    def _get_count_favorites_stmt(user_id: int) -> Select[tuple[int]]:
+        """Запрос количества активных избранных объявлений пользователя"""
         stmt = (
             select(func.count())
             .select_from(UserRealtyFavorite)
@@ -125,35 +220,115 @@ class CRUDRealty:
                 Realty.is_active,
             )
         )
-        result: Result[tuple[int]] = await session.execute(stmt)
-        total = cast(int, result.scalar())
-
-        return total
+        return stmt
 
     @staticmethod
-    async def _get_user_realty_favorite(
+    async def get_favorite_ids(
         session: AsyncSession,
         user_id: int,
-        realty_id: int,
-    ) -> UserRealtyFavorite | None:
-        stmt = select(UserRealtyFavorite).filter_by(
-            user_id=user_id, realty_id=realty_id
+        realty_ids: Sequence[int],
+    ) -> set[int]:
+        """id избранных объявлений пользователя среди переданных объявлений"""
+        if not realty_ids:
+            return set()
+
+        stmt = select(UserRealtyFavorite.realty_id).filter(
+            UserRealtyFavorite.user_id == user_id,
+            UserRealtyFavorite.realty_id.in_(realty_ids),
         )
-        result: Result[tuple[UserRealtyFavorite]] = await session.execute(stmt)
-        favorite: UserRealtyFavorite | None = result.scalar()
+        result: Result[tuple[int]] = await session.execute(stmt)
+        favorite_ids = set(result.scalars())
 
-        return favorite
+        return favorite_ids
 
     @staticmethod
+    async def get_cities(
+        session: AsyncSession,
+        prefix: str,
+        limit: int = 10,
+    ) -> list[RowMapping]:
+        """Города активных объявлений, начинающиеся с префикса, с количеством
+        объявлений в каждом"""
+        prefix = normalize_city(prefix)
+        stmt = (
+            select(
+                func.min(Realty.city).label("city"),
+                func.count().label("count"),
+            )
+            .filter(
+                Realty.is_active,
+                # Диапазон по префиксу обслуживается индексом при любой collation
+                Realty.city_normalized >= prefix,
+                Realty.city_normalized < prefix + chr(0x10FFFF),
+            )
+            .group_by(Realty.city_normalized)
+            .order_by(desc("count"), Realty.city_normalized)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        cities = result.mappings().all()
+
+        return list(cities)
+
+    def get_clusters_stmt(self, filter_query: RealtySchemaClusterFilter) -> Select[Any]:
+        """Запрос кластеров: объявления по фильтру группируются по ячейкам сетки
+        одним запросом, размер ответа зависит от zoom, а не от числа объявлений"""
+        cell_size = get_cluster_cell_size(filter_query.zoom, CLUSTER_CELLS_PER_TILE)
+        cell_lat = get_cluster_cell(Realty.latitude, 90, cell_size)
+        cell_lon = get_cluster_cell(Realty.longitude, 180, cell_size)
+        stmt = select(
+            func.count().label("count"),
+            func.avg(Realty.latitude).label("latitude"),
+            func.avg(Realty.longitude).label("longitude"),
+            func.min(Realty.price).label("min_price"),
+            func.max(Realty.price).label("max_price"),
+        )
+        stmt = self._applying_search_filters(stmt, filter_query)
+
+        return stmt.group_by(cell_lat, cell_lon).order_by(cell_lat, cell_lon)
+
+    async def get_clusters(
+        self,
+        session: AsyncSession,
+        filter_query: RealtySchemaClusterFilter,
+    ) -> list[RowMapping]:
+        """Кластеры объявлений в прямоугольнике карты для уровня zoom"""
+        result = await session.execute(self.get_clusters_stmt(filter_query))
+        clusters = result.mappings().all()
+
+        return list(clusters)
+
     async def get_created_user(
+        self,
         session: AsyncSession,
         user_id: int,
-    ) -> list[Realty]:
-        stmt = select(Realty).filter_by(user_id=user_id).order_by("created_at")
-        result: Result[tuple[Realty]] = await session.execute(stmt)
-        realtys = result.scalars().all()
+        filter_query: RealtySchemaUserFilter = RealtySchemaUserFilter(),
+    ) -> RealtyPage[Row[Any]]:
+        """Получение страницы объявлений пользователя вместе с их количеством"""
+        stmt = select(*REALTY_SHORT_COLUMNS).filter(Realty.user_id == user_id)
+        count_stmt = (
+            select(func.count()).select_from(Realty).filter(Realty.user_id == user_id)
+        )
+        if filter_query.is_active is not None:
+            stmt = stmt.filter(Realty.is_active == filter_query.is_active)
+            count_stmt = count_stmt.filter(Realty.is_active == filter_query.is_active)
+
+        field_order = getattr(Realty, filter_query.order_by)
+
+        return await self._get_page(
+            session,
+            self._applying_page(stmt, count_stmt, filter_query, field_order),
+            count_stmt,
+            filter_query,
+        )
+
+    @staticmethod
+    async def exists_by_id(session: AsyncSession, realty_id: int) -> bool:
+        """Проверка существования объявления без его загрузки"""
+        stmt = select(exists().where(Realty.id == realty_id))
+        result: Result[tuple[bool]] = await session.execute(stmt)
 
-        return list(realtys)
+        return bool(result.scalar())
 
     async def follow_favorite(
         self,
@@ -161,26 +336,72 @@ class CRUDRealty:
         user_id: int,
         realty_id: int,
     ) -> None:
-        favorite = await self._get_user_realty_favorite(session, user_id, realty_id)
-        if favorite is None:
-            session.add(UserRealtyFavorite(user_id=user_id, realty_id=realty_id))
-            await session.commit()
+        """Добавление в избранное одним запросом, повторное добавление ничего
+        не меняет"""
+        stmt = self._insert_favorites(session).values(
+            user_id=user_id, realty_id=realty_id
+        )
+        await session.execute(stmt)
+        await session.commit()
 
+    @staticmethod
     async def unfollow_favorite(
-        self,
         session: AsyncSession,
         user_id: int,
         realty_id: int,
     ) -> None:
-        favorite = await self._get_user_realty_favorite(session, user_id, realty_id)
-        if favorite is not None:
-            await session.delete(favorite)
-            await session.commit()
+        """Удаление из избранного одним запросом"""
+        stmt = delete(UserRealtyFavorite).filter_by(
+            user_id=user_id, realty_id=realty_id
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+    async def sync_favorites(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        realty_ids: Sequence[int],
+    ) -> list[int]:
+        """Замена избранного пользователя переданным списком объявлений: лишние
+        удаляются, недостающие добавляются, несуществующие id пропускаются.
+        Возвращает id избранных объявлений в порядке добавления"""
+        await session.execute(
+            delete(UserRealtyFavorite).filter(
+                UserRealtyFavorite.user_id == user_id,
+                UserRealtyFavorite.realty_id.not_in(realty_ids),
+            )
+        )
+        if realty_ids:
+            stmt = self._insert_favorites(session).from_select(
+                ["user_id", "realty_id"],
+                select(literal(user_id), Realty.id).filter(Realty.id.in_(realty_ids)),
+            )
+            await session.execute(stmt)
+        await session.commit()
+
+        result: Result[tuple[int]] = await session.execute(
+            select(UserRealtyFavorite.realty_id)
+            .filter(UserRealtyFavorite.user_id == user_id)
+            .order_by(UserRealtyFavorite.created_at, UserRealtyFavorite.id)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    def _insert_favorites(session: AsyncSession) -> SQLiteInsert | PostgreSQLInsert:
+        """INSERT в избранное, пропускающий уже добавленные объявления"""
+        dialect_name = session.get_bind().dialect.name
+        insert_favorites = (
+            postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+        )
+        return insert_favorites(UserRealtyFavorite).on_conflict_do_nothing(
+            index_elements=["user_id", "realty_id"]
+        )
 
     @staticmethod
-    def _applying_search_filters[T: (Realty, int, tuple[Realty, bool])](
-        stmt: Select[tuple[T]], filter_query: RealtySchemaFilter
-    ) -> Select[tuple[T]]:
+    def _applying_search_filters[T: tuple[Any, ...]](
+        stmt: Select[T], filter_query: RealtySchemaSearch
+    ) -> Select[T]:
         """Применение поисковых фильтров для объявлений"""
         if filter_query.min_price is not None:
             stmt = stmt.filter(Realty.price >= filter_query.min_price)
@@ -189,10 +410,17 @@ class CRUDRealty:
             stmt = stmt.filter(Realty.price <= filter_query.max_price)
 
         if filter_query.city is not None:
-            stmt = stmt.filter(Realty.city.like(f"%{filter_query.city.lower()}%"))
+            city = normalize_city(filter_query.city)
+            if len(city) >= TRIGRAM_MIN_LENGTH:
+                stmt = stmt.filter(realty_city_match(city))
+            else:
+                # Слишком короткая подстрока для триграммного индекса
+                stmt = stmt.filter(
+                    Realty.city_normalized.contains(city, autoescape=True)
+                )
 
         if filter_query.with_photos:
-            stmt = stmt.filter(Realty.images.any())
+            stmt = stmt.filter(Realty.image_count > 0)
 
         if filter_query.rooms is not None:
             if filter_query.rooms >= 5:
@@ -206,20 +434,152 @@ class CRUDRealty:
         if filter_query.is_active:
             stmt = stmt.filter(Realty.is_active)
 
+        if filter_query.q is not None:
+            stmt = stmt.filter(realty_text_match(filter_query.q))
+
+        if filter_query.bbox is not None:
+            stmt = CRUDRealty._applying_bbox_filter(stmt, *filter_query.bbox)
+
+        if filter_query.near is not None:
+            latitude, longitude = filter_query.near
+            stmt = CRUDRealty._applying_bbox_filter(
+                stmt, *get_radius_bbox(latitude, longitude, filter_query.radius_km)
+            )
+            distance_km_sq = get_distance_km_sq(
+                Realty.latitude, Realty.longitude, latitude, longitude
+            )
+            stmt = stmt.filter(distance_km_sq <= filter_query.radius_km**2)
+
         return stmt
 
     @staticmethod
-    def _applying_offset_limit_order_filters(
-        stmt: Select[tuple[Realty]], filter_query: RealtySchemaFilter
-    ) -> Select[tuple[Realty]]:
-        """Применение limit, offset и order из поискового фильтра для объявлений"""
-        field_order = getattr(Realty, filter_query.order_by)
-        order = desc if filter_query.desc_order else asc
+    def _applying_bbox_filter[T: tuple[Any, ...]](
+        stmt: Select[T],
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+    ) -> Select[T]:
+        """Отбор объявлений в прямоугольнике: кандидаты из пространственного индекса
+        и точная проверка координат (R*Tree хранит их с округлением)"""
+        return stmt.filter(
+            realty_in_bbox(min_lat, min_lon, max_lat, max_lon),
+            Realty.latitude.between(min_lat, max_lat),
+            Realty.longitude.between(min_lon, max_lon),
+        )
 
-        stmt = (
-            stmt.order_by(order(field_order))
-            .offset(filter_query.offset)
-            .limit(filter_query.limit)
+    def _get_count_stmt(self, filter_query: RealtySchemaFilter) -> Select[tuple[int]]:
+        """Запрос количества объявлений для фильтра. В режиме capped подсчёт
+        останавливается на TOTAL_COUNT_CAP + 1 объявлении"""
+        if filter_query.count == "capped":
+            realty_ids = self._applying_search_filters(select(Realty.id), filter_query)
+            realty_ids = realty_ids.limit(TOTAL_COUNT_CAP + 1)
+            return select(func.count()).select_from(realty_ids.subquery())
+
+        stmt = select(func.count()).select_from(Realty)
+        return self._applying_search_filters(stmt, filter_query)
+
+    def _applying_page(
+        self,
+        stmt: Select[Any],
+        count_stmt: Select[tuple[int]],
+        pagination: RealtySchemaPagination,
+        field_order: ColumnElement[Any],
+        count: TotalCountMode = "exact",
+    ) -> Select[Any]:
+        """Запрос страницы со столбцом total, чтобы получить страницу и количество
+        за один запрос. Без курсора точное количество считается оконной функцией,
+        иначе - подзапросом count_stmt"""
+        if count != "none":
+            total: ColumnElement[int]
+            if count == "exact" and pagination.cursor is None:
+                # Окно считается до применения limit/offset, т.е. по всему фильтру
+                total = func.count().over()
+            else:
+                # Условие курсора сужает выборку, а capped подсчёт ограничен лимитом
+                total = count_stmt.scalar_subquery()
+            stmt = stmt.add_columns(total.label("total"))
+
+        return self._applying_pagination(stmt, pagination, field_order)
+
+    @staticmethod
+    async def _get_page(
+        session: AsyncSession,
+        page_stmt: Select[Any],
+        count_stmt: Select[tuple[int]],
+        pagination: RealtySchemaPagination,
+        count: TotalCountMode = "exact",
+    ) -> RealtyPage[Row[Any]]:
+        """Страница объявлений с количеством из столбца total. Для пустой страницы
+        за пределами выборки количество считается отдельным запросом"""
+        result: Result[Any] = await session.execute(page_stmt)
+        rows = result.all()
+
+        total: int | None
+        if count == "none":
+            total = None
+        elif rows:
+            total = rows[0].total
+        elif pagination.offset == 0 and pagination.cursor is None:
+            total = 0
+        else:
+            count_result: Result[tuple[int]] = await session.execute(count_stmt)
+            total = cast(int, count_result.scalar())
+
+        is_total_capped = (
+            count == "capped" and total is not None and total > TOTAL_COUNT_CAP
+        )
+        if is_total_capped:
+            total = TOTAL_COUNT_CAP
+
+        return RealtyPage(
+            items=list(rows), total=total, is_total_capped=is_total_capped
+        )
+
+    @staticmethod
+    def _get_field_order(filter_query: RealtySchemaSearch) -> ColumnElement[Any]:
+        """Поле сортировки из поискового фильтра"""
+        order_by = filter_query.order_by or "created_at"
+        field_order: ColumnElement[Any]
+        if order_by == "relevance" and filter_query.q is not None:
+            field_order = realty_text_rank(filter_query.q)
+        elif order_by == "distance" and filter_query.near is not None:
+            # Как и у релевантности, больше - лучше: ближайшие первыми при desc_order
+            field_order = -get_distance_km_sq(
+                Realty.latitude, Realty.longitude, *filter_query.near
+            )
+        else:
+            field_order = getattr(Realty, order_by)
+
+        return field_order
+
+    @staticmethod
+    def _applying_pagination(
+        stmt: Select[Any],
+        pagination: RealtySchemaPagination,
+        field_order: ColumnElement[Any],
+    ) -> Select[Any]:
+        """Применение limit, offset (или курсора) и сортировки по полю. При равных
+        значениях поля сортировки порядок задаёт id объявления в том же
+        направлении"""
+        order = desc if pagination.desc_order else asc
+
+        if pagination.cursor is not None:
+            # Keyset-пагинация: продолжаем сразу после последнего объявления страницы
+            _, _, last_value, last_id = decode_cursor(pagination.cursor)
+            if pagination.desc_order:
+                after_value = field_order < last_value
+                after_id = Realty.id < last_id
+            else:
+                after_value = field_order > last_value
+                after_id = Realty.id > last_id
+            stmt = stmt.filter(after_value | ((field_order == last_value) & after_id))
+        else:
+            stmt = stmt.offset(pagination.offset)
+
+        # id в том же направлении, что и поле: порядок целиком отдаётся индексом
+        stmt = stmt.order_by(order(field_order), order(Realty.id)).limit(
+            pagination.limit
         )
 
         return stmt
@@ -232,10 +592,69 @@ class CRUDRealty:
     ) -> Realty:
         new_realty = self._init_realty_ORM_from_realty_in(realty_in, user_id)
         session.add(new_realty)
+        await session.flush()
+        new_realty.sync_images()
         await session.commit()
+        listing_cache.bump_version()
 
         return new_realty
 
+    @staticmethod
+    async def create_many(
+        session: AsyncSession,
+        realtys_in: Sequence[RealtySchemaCreate],
+        user_id: int,
+    ) -> list[int]:
+        """Пакетное создание объявлений: один INSERT ... RETURNING для объявлений
+        и один для их фото. Возвращает id объявлений в порядке realtys_in"""
+        realty_ids = list(
+            await session.scalars(
+                insert(Realty).returning(Realty.id, sort_by_parameter_order=True),
+                [
+                    {
+                        **realty_in.model_dump(exclude={"images"}),
+                        # Массовая вставка не вызывает валидаторы модели
+                        "city_normalized": normalize_city(realty_in.city),
+                        "image_count": len(realty_in.images),
+                        "user_id": user_id,
+                    }
+                    for realty_in in realtys_in
+                ],
+            )
+        )
+
+        images_values = [
+            {**image_in.model_dump(), "position": position, "realty_id": realty_id}
+            for realty_id, realty_in in zip(realty_ids, realtys_in, strict=True)
+            for position, image_in in enumerate(realty_in.images)
+        ]
+        if images_values:
+            image_ids = await session.scalars(
+                insert(Image).returning(Image.id, sort_by_parameter_order=True),
+                images_values,
+            )
+            # Титульное фото объявления - фото с position = 0
+            await session.execute(
+                update(Realty),
+                [
+                    {
+                        "id": image_values["realty_id"],
+                        "title_image_id": image_id,
+                        "title_image_url": image_values["url"],
+                        "title_image_public_id": image_values["public_id"],
+                    }
+                    for image_id, image_values in zip(
+                        image_ids, images_values, strict=True
+                    )
+                    if image_values["position"] == 0
+                ],
+            )
+
+        await session.commit()
+        listing_cache.bump_version()
+
+        return realty_ids
+
     @staticmethod
     def _init_realty_ORM_from_realty_in(
         realty_in: RealtySchemaCreate, user_id: int
@@ -280,13 +699,12 @@ class CRUDRealty:
                         existing_image.position = position
                     # После обновления фото, удаляем его из словаря
                     existing_images.pop(image_in.id)
-            # Удаляем оставшиеся фото в словаре из БД и сервера
-            public_ids_need_to_delete = []
+            # Удаляем оставшиеся фото в словаре из БД, а с сервера - через outbox
             for image in existing_images.values():
-                public_ids_need_to_delete.append(image.public_id)
+                session.add(ImageDeletion(public_id=image.public_id))
                 realty.images.remove(image)
-
-            delete_images(public_ids_need_to_delete)
+        # Время изменения входит в версию объявления, даже если изменились только фото
+        realty.update_at = datetime.now(tz=UTC)
         # Обновляем объявление
         for name, value in realty_in.model_dump(
             exclude_none=True, exclude={"images"}
@@ -294,17 +712,24 @@ class CRUDRealty:
             if getattr(realty, name) != value:
                 setattr(realty, name, value)
 
+        if realty_in.images:
+            await session.flush()
+            realty.sync_images()
         await session.commit()
+        listing_cache.bump_version()
         await session.refresh(realty, attribute_names=["images"])
 
         return realty
 
     @staticmethod
     async def delete(session: AsyncSession, realty: Realty) -> None:
+        # Фото удалятся с сервера через outbox после фиксации транзакции
+        session.add_all(
+            ImageDeletion(public_id=image.public_id) for image in realty.images
+        )
         await session.delete(realty)
         await session.commit()
-
-        delete_images([image.public_id for image in realty.images])
+        listing_cache.bump_version()
 
 
 realty_crud = CRUDRealty()
@@ -23,6 +23,17 @@ async def get_realty_by_id(
     return realty
 
 
+async def get_existing_realty_id(
+    realty_id: Annotated[int, Path(gt=0)],
+    session: AsyncSession = Depends(get_session),
+) -> int:
+    """id существующего объявления, без загрузки самого объявления"""
+    if not await realty_crud.exists_by_id(session, realty_id):
+        raise NotFound(detail=f"Realty id={realty_id} not found")
+
+    return realty_id
+
+
 async def get_realty_by_id_for_current_user(
     realty: Realty = Depends(get_realty_by_id),
     current_user: User = Depends(get_current_user),
@@ -0,0 +1,52 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+from typing import Any
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.realty.constants import EXPORT_CSV_BUFFER_SIZE
+from src.realty.crud import realty_crud
+from src.realty.schemas import RealtySchemaExport, RealtySchemaExportFilter
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def export_realtys(
+    session: AsyncSession,
+    filter_query: RealtySchemaExportFilter,
+) -> AsyncIterator[bytes]:
+    """Экспорт объявлений по фильтру построчно, без загрузки всей выборки в память.
+    Ответ отдаётся после выхода из зависимостей, поэтому сессию закрываем сами"""
+    rows = realty_crud.stream_list(session, filter_query)
+    serialize = _to_ndjson if filter_query.format == "ndjson" else _to_csv
+    try:
+        async for chunk in serialize(rows):
+            yield chunk
+    finally:
+        await session.close()
+
+
+async def _to_ndjson(rows: AsyncIterator[Row[Any]]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        realty = RealtySchemaExport.model_validate(row, from_attributes=True)
+        yield realty.model_dump_json().encode() + b"\n"
+
+
+async def _to_csv(rows: AsyncIterator[Row[Any]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(RealtySchemaExport.model_fields))
+    writer.writeheader()
+    async for row in rows:
+        realty = RealtySchemaExport.model_validate(row, from_attributes=True)
+        writer.writerow(realty.model_dump(mode="json"))
+        if buffer.tell() >= EXPORT_CSV_BUFFER_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode()
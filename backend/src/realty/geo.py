@@ -0,0 +1,157 @@
+import math
+from typing import Any
+
+from sqlalchemy import (
+    Boolean,
+    ColumnElement,
+    SQLColumnExpression,
+    Table,
+    func,
+    literal,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.functions import FunctionElement
+
+# SQLite: R*Tree по координатам объявлений, синхронизируемый триггерами. Точка
+# хранится вырожденным прямоугольником, объявления без координат в индекс не попадают
+SQLITE_GEO_DDL = (
+    "CREATE VIRTUAL TABLE realty_geo USING rtree("
+    "id, min_lat, max_lat, min_lon, max_lon)",
+    "CREATE TRIGGER realty_geo_ai AFTER INSERT ON realtys "
+    "WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN "
+    "INSERT INTO realty_geo VALUES "
+    "(new.id, new.latitude, new.latitude, new.longitude, new.longitude); END",
+    "CREATE TRIGGER realty_geo_ad AFTER DELETE ON realtys BEGIN "
+    "DELETE FROM realty_geo WHERE id = old.id; END",
+    "CREATE TRIGGER realty_geo_au AFTER UPDATE OF latitude, longitude ON realtys "
+    "BEGIN "
+    "DELETE FROM realty_geo WHERE id = old.id; "
+    "INSERT INTO realty_geo SELECT "
+    "new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+    "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END",
+)
+
+# PostgreSQL: GiST-индекс по точке без расширения PostGIS
+POSTGRESQL_GEO_DDL = (
+    "CREATE INDEX ix_realtys_location ON realtys "
+    "USING gist (point(longitude, latitude))",
+)
+
+# Длина градуса широты в км
+KM_PER_DEGREE = 111.32
+
+
+def create_geo_index(target: Table, connection: Connection, **kw: Any) -> None:
+    """Создание пространственного индекса вместе с таблицей объявлений"""
+    statements = {
+        "sqlite": SQLITE_GEO_DDL,
+        "postgresql": POSTGRESQL_GEO_DDL,
+    }.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def drop_geo_index(target: Table, connection: Connection, **kw: Any) -> None:
+    """Удаление R*Tree перед удалением таблицы объявлений"""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS realty_geo")
+
+
+def get_radius_bbox(
+    latitude: float, longitude: float, radius_km: float
+) -> tuple[float, float, float, float]:
+    """Прямоугольник (min_lat, min_lon, max_lat, max_lon), описанный вокруг круга.
+    Если круг задевает полюс или антимеридиан, берётся вся долгота"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(latitude))
+    if min_lat <= -90 or max_lat >= 90 or cos_lat <= 0:
+        return min_lat, -180.0, max_lat, 180.0
+    delta_lon = delta_lat / cos_lat
+    if longitude - delta_lon < -180 or longitude + delta_lon > 180:
+        return min_lat, -180.0, max_lat, 180.0
+
+    return min_lat, longitude - delta_lon, max_lat, longitude + delta_lon
+
+
+def get_distance_km_sq(
+    latitude_column: SQLColumnExpression[float | None],
+    longitude_column: SQLColumnExpression[float | None],
+    latitude: float,
+    longitude: float,
+) -> ColumnElement[float | None]:
+    """Квадрат расстояния до точки в км² в равнопромежуточной проекции. Без
+    тригонометрии в SQL, точность достаточна для радиусов поиска до сотен км"""
+    cos_lat = math.cos(math.radians(latitude))
+    delta_lat = latitude_column - latitude
+    delta_lon = (longitude_column - longitude) * cos_lat
+    return (delta_lat * delta_lat + delta_lon * delta_lon) * KM_PER_DEGREE**2
+
+
+def get_cluster_cell_size(zoom: int, cells_per_tile: int) -> float:
+    """Сторона ячейки сетки кластеров в градусах: на уровне zoom долгота делится
+    на 2^zoom тайлов, каждый тайл - на cells_per_tile ячеек"""
+    return 360 / ((1 << zoom) * cells_per_tile)
+
+
+def get_cluster_cell(
+    column: SQLColumnExpression[float | None], offset: float, cell_size: float
+) -> ColumnElement[int]:
+    """Номер ячейки сетки по координате, сдвинутой в неотрицательный диапазон"""
+    return func.floor((column + offset) / cell_size)
+
+
+class realty_in_bbox(FunctionElement[bool]):
+    """Предварительный отбор объявлений в прямоугольнике по пространственному
+    индексу. Точное условие по координатам добавляется отдельно"""
+
+    type = Boolean()
+    inherit_cache = True
+    # Условие уже логическое: без "= 1" в SQLite, иначе IN не используется индексом
+    _is_implicitly_boolean = True
+
+    def __init__(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> None:
+        super().__init__(
+            literal(min_lat), literal(min_lon), literal(max_lat), literal(max_lon)
+        )
+
+
+def _compile_bbox(
+    element: realty_in_bbox, compiler: SQLCompiler, **kw: Any
+) -> list[str]:
+    return [compiler.process(clause, **kw) for clause in element.clauses]
+
+
+@compiles(realty_in_bbox, "sqlite")
+def _sqlite_in_bbox(element: realty_in_bbox, compiler: SQLCompiler, **kw: Any) -> str:
+    min_lat, min_lon, max_lat, max_lon = _compile_bbox(element, compiler, **kw)
+    return (
+        "realtys.id IN (SELECT id FROM realty_geo "
+        f"WHERE max_lat >= {min_lat} AND min_lat <= {max_lat} "
+        f"AND max_lon >= {min_lon} AND min_lon <= {max_lon})"
+    )
+
+
+@compiles(realty_in_bbox, "postgresql")
+def _postgresql_in_bbox(
+    element: realty_in_bbox, compiler: SQLCompiler, **kw: Any
+) -> str:
+    min_lat, min_lon, max_lat, max_lon = _compile_bbox(element, compiler, **kw)
+    return (
+        "point(realtys.longitude, realtys.latitude) <@ "
+        f"box(point({min_lon}, {min_lat}), point({max_lon}, {max_lat}))"
+    )
+
+
+@compiles(realty_in_bbox)
+def _default_in_bbox(element: realty_in_bbox, compiler: SQLCompiler, **kw: Any) -> str:
+    min_lat, min_lon, max_lat, max_lon = _compile_bbox(element, compiler, **kw)
+    return (
+        f"realtys.latitude BETWEEN {min_lat} AND {max_lat} "
+        f"AND realtys.longitude BETWEEN {min_lon} AND {max_lon}"
+    )
@@ -4,12 +4,25 @@ from typing import TYPE_CHECKING
 from sqlalchemy import (
     CheckConstraint,
     ForeignKey,
+    Index,
     Text,
     UniqueConstraint,
+    event,
+)
+from sqlalchemy.orm import (
+    Mapped,
+    mapped_column,
+    relationship,
+    validates,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.core.database import Base, created_at, updated_at
+from src.realty.geo import create_geo_index, drop_geo_index
+from src.realty.search import (
+    create_full_text_index,
+    drop_full_text_index,
+    normalize_city,
+)
 
 if TYPE_CHECKING:
     from src.image.models import Image
@@ -28,6 +41,27 @@ class Realty(Base):
             "(type != 'Apartment' OR (floor IS NOT NULL AND rooms IS NOT NULL))",
             name="check_apartment_details",
         ),
+        # Автодополнение города: диапазон по префиксу среди активных объявлений
+        Index("ix_realtys_is_active_city_normalized", "is_active", "city_normalized"),
+        # Сортировки ленты активных объявлений: по дате и по цене
+        Index("ix_realtys_is_active_created_at", "is_active", "created_at"),
+        Index("ix_realtys_is_active_price", "is_active", "price"),
+        # Фильтр по типу и комнатам с диапазоном цены
+        Index(
+            "ix_realtys_is_active_type_rooms_price",
+            "is_active",
+            "type",
+            "rooms",
+            "price",
+        ),
+        # Фильтр with_photos
+        Index("ix_realtys_is_active_image_count", "is_active", "image_count"),
+        # Объявления пользователя
+        Index("ix_realtys_user_id_created_at", "user_id", "created_at"),
+        CheckConstraint(
+            "(latitude IS NULL) = (longitude IS NULL)",
+            name="check_coordinates",
+        ),
     )
 
     title: Mapped[str]
@@ -37,26 +71,29 @@ class Realty(Base):
     floor: Mapped[int | None]
     rooms: Mapped[int | None]
     city: Mapped[str]
+    city_normalized: Mapped[str]
     state: Mapped[str]
     type: Mapped[RealtyType]
     is_active: Mapped[bool] = mapped_column(default=True)
+    # Координаты для поиска на карте, индексируются create_geo_index
+    latitude: Mapped[float | None]
+    longitude: Mapped[float | None]
+    # Количество фото и титульное фото (position = 0) для карточек в списках,
+    # синхронизируются методом sync_images при изменении фото
+    image_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    title_image_id: Mapped[int | None]
+    title_image_url: Mapped[str | None]
+    title_image_public_id: Mapped[str | None]
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     created_at: Mapped[created_at]
     update_at: Mapped[updated_at]
 
     user: Mapped["User"] = relationship(back_populates="realtys")
 
-    title_image: Mapped["Image"] = relationship(
-        back_populates="realty",
-        primaryjoin="and_(Realty.id == Image.realty_id, Image.position == 0)",
-        lazy="joined",
-        viewonly=True,
-    )
     images: Mapped[list["Image"]] = relationship(
         cascade="all, delete-orphan",
         back_populates="realty",
         order_by="Image.position",
-        overlaps="title_image",
     )
     followers: Mapped[list["User"]] = relationship(
         secondary="user_realty_favorites",
@@ -67,11 +104,37 @@ class Realty(Base):
     repr_cols_num = 10
     repr_cols = ("created_at", "id")
 
+    def sync_images(self) -> None:
+        """Синхронизация количества фото и титульного фото с коллекцией images.
+        Вызывается после flush, чтобы у новых фото были id"""
+        title_image = min(self.images, key=lambda image: image.position, default=None)
+        self.image_count = len(self.images)
+        self.title_image_id = title_image.id if title_image else None
+        self.title_image_url = title_image.url if title_image else None
+        self.title_image_public_id = title_image.public_id if title_image else None
+
+    @validates("city")
+    def validate_city(self, key: str, city: str) -> str:
+        """Синхронизация нормализованного города, по которому идёт поиск"""
+        self.city_normalized = normalize_city(city)
+        return city
+
+
+event.listen(Realty.__table__, "after_create", create_full_text_index)
+event.listen(Realty.__table__, "before_drop", drop_full_text_index)
+event.listen(Realty.__table__, "after_create", create_geo_index)
+event.listen(Realty.__table__, "before_drop", drop_geo_index)
+
 
 class UserRealtyFavorite(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "realty_id", name="idx_unique_user_realty"),
+        # Уникальный индекс начинается с user_id, удаление объявления ищет по realty_id
+        Index("ix_user_realty_favorites_realty_id", "realty_id"),
+        # Избранное пользователя по времени добавления
+        Index("ix_user_realty_favorites_user_id_created_at", "user_id", "created_at"),
     )
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     realty_id: Mapped[int] = mapped_column(ForeignKey("realtys.id", ondelete="CASCADE"))
+    created_at: Mapped[created_at]
@@ -1,9 +1,27 @@
-from typing import Literal, Self
+import math
+import re
+from datetime import datetime
+from typing import Any, Literal, Self
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    field_validator,
+    model_validator,
+)
 
 from src.image.schemas import ImageSchema, ImageSchemaCreate, ImageSchemaUpdate
+from src.realty.constants import CLUSTER_CELLS_PER_TILE, CLUSTER_MAX_CELLS
+from src.realty.geo import get_cluster_cell_size
 from src.realty.models import RealtyType
+from src.realty.utils import decode_cursor
+
+
+def validate_coordinates(latitude: float, longitude: float) -> None:
+    """Проверка диапазонов широты и долготы"""
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("Coordinates out of range")
 
 
 class RealtySchemaBase(BaseModel):
@@ -17,6 +35,15 @@ class RealtySchemaBase(BaseModel):
     state: str
     type: RealtyType
     is_active: bool = True
+    latitude: float | None = Field(ge=-90, le=90, default=None)
+    longitude: float | None = Field(ge=-180, le=180, default=None)
+
+    @model_validator(mode="after")
+    def check_coordinates(self) -> Self:
+        """Координаты задаются только парой"""
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("Latitude and longitude must be specified together")
+        return self
 
 
 class RealtySchemaCreate(RealtySchemaBase):
@@ -47,9 +74,18 @@ class RealtySchemaUpdate(BaseModel):
     state: str | None = None
     type: RealtyType
     is_active: bool | None = None
+    latitude: float | None = Field(ge=-90, le=90, default=None)
+    longitude: float | None = Field(ge=-180, le=180, default=None)
 
     images: list[ImageSchemaUpdate] | None = None
 
+    @model_validator(mode="after")
+    def check_coordinates(self) -> Self:
+        """Координаты меняются только парой"""
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("Latitude and longitude must be specified together")
+        return self
+
     @model_validator(mode="after")
     def check_is_not_apartment(self) -> Self:
         """Если не Apartment, то необходимо обнулить этаж и комнаты"""
@@ -75,9 +111,55 @@ class RealtySchemaFull(RealtySchema):
     images: list[ImageSchema]
 
 
-class RealtySchemaFilter(BaseModel):
+class RealtySchemaExport(RealtySchema):
+    created_at: datetime
+    title_image_url: str | None
+
+
+class RealtySchemaFavoritesSync(BaseModel):
+    realty_ids: list[int] = Field(max_length=1000)
+
+
+class RealtySchemaImportResult(BaseModel):
+    """Результат импорта строки NDJSON: id созданного объявления или ошибки"""
+
+    line: int
+    id: int | None = None
+    errors: list[dict[str, Any]] | None = None
+
+
+class CitySchema(BaseModel):
+    city: str
+    count: int
+
+
+# exact - точное количество, capped - не больше TOTAL_COUNT_CAP, none - без подсчёта
+TotalCountMode = Literal["exact", "capped", "none"]
+
+
+class RealtySchemaPagination(BaseModel):
+    """Параметры страницы: limit/offset или курсор и направление сортировки"""
+
     limit: int = Field(default=100, gt=0, le=100)
     offset: int = Field(default=0, ge=0)
+    cursor: str | None = None
+    desc_order: bool = True
+
+    @model_validator(mode="after")
+    def check_cursor(self) -> Self:
+        """Проверка, что курсор получен для того же порядка сортировки. Поле
+        order_by объявляют схемы-наследники"""
+        if self.cursor is not None:
+            cursor_order_by, desc_order, _, _ = decode_cursor(self.cursor)
+            order_by = getattr(self, "order_by", None)
+            if cursor_order_by != order_by or desc_order != self.desc_order:
+                raise ValueError("Cursor doesn`t match order_by and desc_order")
+        return self
+
+
+class RealtySchemaSearch(BaseModel):
+    """Поисковые условия и сортировка объявлений, без параметров страницы"""
+
     is_active: bool = True
     min_price: int | None = Field(ge=0, default=None)
     max_price: int | None = Field(ge=0, default=None)
@@ -85,7 +167,15 @@ class RealtySchemaFilter(BaseModel):
     city: str | None = None
     type: RealtyType | None = None
     with_photos: bool = False
-    order_by: Literal["created_at", "price"] = "created_at"
+    q: str | None = Field(default=None, max_length=200)
+    # Прямоугольник карты: min_lat,min_lon,max_lat,max_lon
+    bbox: tuple[float, float, float, float] | None = None
+    # Точка lat,lon: поиск в радиусе radius_km с сортировкой по расстоянию
+    near: tuple[float, float] | None = None
+    radius_km: float = Field(default=10, gt=0, le=500)
+    # По умолчанию created_at, при полнотекстовом поиске - relevance, а при поиске
+    # рядом с точкой - distance
+    order_by: Literal["created_at", "price", "relevance", "distance"] | None = None
     desc_order: bool = True
 
     @field_validator("type", mode="before")
@@ -105,3 +195,118 @@ class RealtySchemaFilter(BaseModel):
         ):
             raise ValueError("Price min can`t be more price max")
         return self
+
+    @field_validator("q")
+    @classmethod
+    def check_q(cls, v: str | None) -> str | None:
+        """Запрос без единого слова равносилен отсутствию запроса"""
+        if v is not None and not re.search(r"\w", v):
+            return None
+        return v
+
+    @field_validator("bbox", "near", mode="before")
+    @classmethod
+    def split_coordinates(cls, v: Any) -> Any:
+        """Координаты в строке запроса передаются через запятую"""
+        if isinstance(v, list) and len(v) == 1:
+            v = v[0]
+        if isinstance(v, str):
+            return v.split(",")
+        return v
+
+    @field_validator("bbox")
+    @classmethod
+    def check_bbox(
+        cls, v: tuple[float, float, float, float] | None
+    ) -> tuple[float, float, float, float] | None:
+        if v is None:
+            return v
+        min_lat, min_lon, max_lat, max_lon = v
+        validate_coordinates(min_lat, min_lon)
+        validate_coordinates(max_lat, max_lon)
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bbox min can`t be more bbox max")
+        return v
+
+    @field_validator("near")
+    @classmethod
+    def check_near(cls, v: tuple[float, float] | None) -> tuple[float, float] | None:
+        if v is not None:
+            validate_coordinates(*v)
+        return v
+
+    @model_validator(mode="after")
+    def set_default_order_by(self) -> Self:
+        """По умолчанию результаты полнотекстового поиска сортируются по
+        релевантности, поиска рядом с точкой - по расстоянию, остальные - по дате
+        создания. В RealtySchemaFilter выполняется раньше проверки курсора из
+        RealtySchemaPagination"""
+        if self.order_by is None:
+            if self.q is not None:
+                self.order_by = "relevance"
+            elif self.near is not None:
+                self.order_by = "distance"
+            else:
+                self.order_by = "created_at"
+        return self
+
+    @model_validator(mode="after")
+    def check_order_by(self) -> Self:
+        """Сортировка по релевантности требует q, по расстоянию - near. Для них
+        курсоры не выдаются"""
+        if self.order_by == "relevance" and self.q is None:
+            raise ValueError("Ordering by relevance requires q")
+        if self.order_by == "distance" and self.near is None:
+            raise ValueError("Ordering by distance requires near")
+        return self
+
+
+class RealtySchemaFilter(RealtySchemaPagination, RealtySchemaSearch):
+    count: TotalCountMode = "exact"
+
+
+class RealtySchemaExportFilter(RealtySchemaSearch):
+    # Выгружаются все объявления по фильтру, без параметров страницы и count
+    format: Literal["ndjson", "csv"] = "ndjson"
+
+
+class RealtySchemaClusterFilter(RealtySchemaSearch):
+    # Кластеры строятся по всем объявлениям фильтра, bbox обязателен
+    zoom: int = Field(ge=0, le=20)
+
+    @model_validator(mode="after")
+    def check_cells(self) -> Self:
+        """Проверка, что прямоугольник карты задан и покрывает не больше
+        CLUSTER_MAX_CELLS ячеек сетки на этом уровне zoom"""
+        if self.bbox is None:
+            raise ValueError("Clustering requires bbox")
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        cell_size = get_cluster_cell_size(self.zoom, CLUSTER_CELLS_PER_TILE)
+        number_cells = (math.floor((max_lat - min_lat) / cell_size) + 1) * (
+            math.floor((max_lon - min_lon) / cell_size) + 1
+        )
+        if number_cells > CLUSTER_MAX_CELLS:
+            raise ValueError("Bbox is too large for zoom")
+        return self
+
+
+class RealtySchemaCluster(BaseModel):
+    """Кластер объявлений ячейки сетки: количество, центр и диапазон цен"""
+
+    count: int
+    latitude: float
+    longitude: float
+    min_price: int
+    max_price: int
+
+
+class RealtySchemaFavoritesFilter(RealtySchemaPagination):
+    # favorited_at - время добавления в избранное
+    order_by: Literal["favorited_at", "created_at", "price"] = "favorited_at"
+
+
+class RealtySchemaUserFilter(RealtySchemaPagination):
+    # None - все объявления пользователя, и активные, и снятые
+    is_active: bool | None = None
+    order_by: Literal["created_at", "price"] = "created_at"
+    desc_order: bool = False
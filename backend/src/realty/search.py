@@ -0,0 +1,214 @@
+import re
+from typing import Any
+
+from sqlalchemy import Boolean, Float, String, Table, TypeDecorator, literal
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.functions import FunctionElement
+
+# SQLite: внешний FTS5-индекс по title/description, синхронизируемый триггерами
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE realty_fts USING fts5("
+    "title, description, content='realtys', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER realty_fts_ai AFTER INSERT ON realtys BEGIN "
+    "INSERT INTO realty_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER realty_fts_ad AFTER DELETE ON realtys BEGIN "
+    "INSERT INTO realty_fts(realty_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER realty_fts_au AFTER UPDATE OF title, description ON realtys BEGIN "
+    "INSERT INTO realty_fts(realty_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO realty_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    # Триграммный индекс по нормализованному городу для поиска по подстроке
+    "CREATE VIRTUAL TABLE realty_city_trgm USING fts5("
+    "city_normalized, content='realtys', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER realty_city_trgm_ai AFTER INSERT ON realtys BEGIN "
+    "INSERT INTO realty_city_trgm(rowid, city_normalized) "
+    "VALUES (new.id, new.city_normalized); END",
+    "CREATE TRIGGER realty_city_trgm_ad AFTER DELETE ON realtys BEGIN "
+    "INSERT INTO realty_city_trgm(realty_city_trgm, rowid, city_normalized) "
+    "VALUES ('delete', old.id, old.city_normalized); END",
+    "CREATE TRIGGER realty_city_trgm_au AFTER UPDATE OF city_normalized ON realtys "
+    "BEGIN "
+    "INSERT INTO realty_city_trgm(realty_city_trgm, rowid, city_normalized) "
+    "VALUES ('delete', old.id, old.city_normalized); "
+    "INSERT INTO realty_city_trgm(rowid, city_normalized) "
+    "VALUES (new.id, new.city_normalized); END",
+)
+
+# PostgreSQL: генерируемый tsvector (заголовок весомее описания) и GIN-индекс по нему
+POSTGRESQL_FTS_DDL = (
+    "ALTER TABLE realtys ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX ix_realtys_search_vector ON realtys USING gin (search_vector)",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX ix_realtys_city_normalized_trgm ON realtys "
+    "USING gin (city_normalized gin_trgm_ops)",
+)
+
+# Минимальная длина подстроки, которую может найти триграммный индекс
+TRIGRAM_MIN_LENGTH = 3
+
+# Вес заголовка и описания в bm25 для SQLite
+SQLITE_BM25_WEIGHTS = "10.0, 1.0"
+
+
+def create_full_text_index(target: Table, connection: Connection, **kw: Any) -> None:
+    """Создание полнотекстового индекса вместе с таблицей объявлений"""
+    statements = {
+        "sqlite": SQLITE_FTS_DDL,
+        "postgresql": POSTGRESQL_FTS_DDL,
+    }.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def drop_full_text_index(target: Table, connection: Connection, **kw: Any) -> None:
+    """Удаление FTS5-таблиц перед удалением таблицы объявлений"""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS realty_fts")
+        connection.exec_driver_sql("DROP TABLE IF EXISTS realty_city_trgm")
+
+
+def normalize_city(city: str) -> str:
+    """Нормализация названия города для индекса: регистр и лишние пробелы"""
+    return " ".join(city.split()).casefold()
+
+
+def to_fts5_query(text: str) -> str:
+    """Преобразование пользовательского текста в запрос FTS5: каждое слово берётся
+    в кавычки, чтобы спецсимволы не разбирались как синтаксис FTS5"""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+class FullTextQuery(TypeDecorator[str]):
+    """Текст поискового запроса, приводимый к синтаксису полнотекстового движка БД"""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
+        if value is not None and dialect.name == "sqlite":
+            return to_fts5_query(value)
+        return value
+
+
+class CitySubstring(TypeDecorator[str]):
+    """Подстрока нормализованного города: фраза для триграммного FTS5 в SQLite и
+    экранированный шаблон LIKE для остальных БД"""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
+        if value is None:
+            return value
+        if dialect.name == "sqlite":
+            return '"{}"'.format(value.replace('"', '""'))
+        escaped = value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+        return f"%{escaped}%"
+
+
+class realty_city_match(FunctionElement[bool]):
+    """Условие вхождения подстроки в нормализованный город объявления. Подстрока
+    должна быть не короче TRIGRAM_MIN_LENGTH символов"""
+
+    type = Boolean()
+    inherit_cache = True
+    # Условие уже логическое: без "= 1" в SQLite, иначе IN не используется индексом
+    _is_implicitly_boolean = True
+
+    def __init__(self, city: str) -> None:
+        super().__init__(literal(normalize_city(city), CitySubstring()))
+
+
+class realty_text_match(FunctionElement[bool]):
+    """Условие совпадения объявления с полнотекстовым запросом"""
+
+    type = Boolean()
+    inherit_cache = True
+    # Условие уже логическое: без "= 1" в SQLite, иначе IN не используется индексом
+    _is_implicitly_boolean = True
+
+    def __init__(self, text: str) -> None:
+        super().__init__(literal(text, FullTextQuery()))
+
+
+class realty_text_rank(FunctionElement[float]):
+    """Релевантность объявления полнотекстовому запросу, больше - релевантнее"""
+
+    type = Float()
+    inherit_cache = True
+
+    def __init__(self, text: str) -> None:
+        super().__init__(literal(text, FullTextQuery()))
+
+
+def _compile_argument(
+    element: FunctionElement[Any], compiler: SQLCompiler, **kw: Any
+) -> str:
+    (query,) = element.clauses
+    return compiler.process(query, **kw)
+
+
+@compiles(realty_text_match, "sqlite")
+def _sqlite_text_match(
+    element: realty_text_match, compiler: SQLCompiler, **kw: Any
+) -> str:
+    query = _compile_argument(element, compiler, **kw)
+    return (
+        f"realtys.id IN (SELECT rowid FROM realty_fts WHERE realty_fts MATCH {query})"
+    )
+
+
+@compiles(realty_text_match, "postgresql")
+def _postgresql_text_match(
+    element: realty_text_match, compiler: SQLCompiler, **kw: Any
+) -> str:
+    query = _compile_argument(element, compiler, **kw)
+    return f"realtys.search_vector @@ websearch_to_tsquery('simple', {query})"
+
+
+@compiles(realty_text_rank, "sqlite")
+def _sqlite_text_rank(
+    element: realty_text_rank, compiler: SQLCompiler, **kw: Any
+) -> str:
+    query = _compile_argument(element, compiler, **kw)
+    # bm25 тем меньше, чем документ релевантнее, поэтому меняем знак
+    return (
+        f"(SELECT -bm25(realty_fts, {SQLITE_BM25_WEIGHTS}) FROM realty_fts "
+        f"WHERE realty_fts MATCH {query} AND realty_fts.rowid = realtys.id)"
+    )
+
+
+@compiles(realty_text_rank, "postgresql")
+def _postgresql_text_rank(
+    element: realty_text_rank, compiler: SQLCompiler, **kw: Any
+) -> str:
+    query = _compile_argument(element, compiler, **kw)
+    return f"ts_rank(realtys.search_vector, websearch_to_tsquery('simple', {query}))"
+
+
+@compiles(realty_city_match, "sqlite")
+def _sqlite_city_match(
+    element: realty_city_match, compiler: SQLCompiler, **kw: Any
+) -> str:
+    city = _compile_argument(element, compiler, **kw)
+    return (
+        "realtys.id IN (SELECT rowid FROM realty_city_trgm "
+        f"WHERE realty_city_trgm MATCH {city})"
+    )
+
+
+@compiles(realty_city_match)
+def _default_city_match(
+    element: realty_city_match, compiler: SQLCompiler, **kw: Any
+) -> str:
+    # В PostgreSQL LIKE обслуживается GIN-индексом pg_trgm
+    city = _compile_argument(element, compiler, **kw)
+    return f"realtys.city_normalized LIKE {city} ESCAPE '/'"
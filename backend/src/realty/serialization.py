@@ -0,0 +1,41 @@
+from collections.abc import Iterable
+from typing import Any
+
+import orjson
+from sqlalchemy import Row
+
+from src.realty.schemas import RealtySchemaShort
+
+# Поля RealtySchemaShort, которые берутся из строки запроса как есть
+REALTY_SHORT_FIELDS = tuple(
+    name
+    for name in RealtySchemaShort.model_fields
+    if name not in ("title_image", "is_favorite")
+)
+
+
+def realtys_short_from_rows(rows: Iterable[Row[Any]]) -> list[dict[str, Any]]:
+    """Объявления в виде словарей RealtySchemaShort из строк запроса. Данные из БД
+    не валидируются повторно, титульное фото собирается из его столбцов"""
+    realtys: list[dict[str, Any]] = []
+    for row in rows:
+        mapping = row._mapping
+        realty = {name: mapping[name] for name in REALTY_SHORT_FIELDS}
+        realty["title_image"] = (
+            None
+            if mapping["title_image_id"] is None
+            else {
+                "url": mapping["title_image_url"],
+                "public_id": mapping["title_image_public_id"],
+                "id": mapping["title_image_id"],
+            }
+        )
+        realty["is_favorite"] = None
+        realtys.append(realty)
+
+    return realtys
+
+
+def dump_realtys(realtys: list[dict[str, Any]]) -> bytes:
+    """JSON-тело ответа из словарей объявлений"""
+    return orjson.dumps(realtys)
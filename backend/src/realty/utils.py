@@ -0,0 +1,164 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import TYPE_CHECKING, Any
+
+from fastapi import Request
+
+if TYPE_CHECKING:
+    from src.realty.schemas import (
+        RealtySchemaFavoritesFilter,
+        RealtySchemaFilter,
+        RealtySchemaUserFilter,
+    )
+
+    type PaginationFilter = (
+        RealtySchemaFilter | RealtySchemaFavoritesFilter | RealtySchemaUserFilter
+    )
+
+
+# Тип значения в курсоре для каждого поля сортировки с курсорной пагинацией
+CURSOR_VALUE_TYPES: dict[str, type] = {
+    "created_at": datetime,
+    "favorited_at": datetime,
+    "price": int,
+}
+
+
+@dataclass
+class RealtyPage[T]:
+    """Страница объявлений (ORM-объекты или строки запроса) с общим количеством
+    объявлений для фильтра"""
+
+    items: list[T]
+    total: int | None = None
+    is_total_capped: bool = False
+
+    @property
+    def total_header(self) -> str | None:
+        """Значение заголовка X-Total-Count: число, число с "+" или None"""
+        if self.total is None:
+            return None
+        return f"{self.total}+" if self.is_total_capped else str(self.total)
+
+
+def encode_cursor(order_by: str, desc_order: bool, value: Any, last_id: int) -> str:
+    """Кодирование позиции последнего объявления страницы в непрозрачный курсор"""
+    payload: dict[str, Any] = {
+        "o": order_by,
+        "d": desc_order,
+        "v": value,
+        "id": last_id,
+    }
+    if isinstance(value, datetime):
+        payload.update({"v": value.isoformat(), "t": "datetime"})
+
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, bool, Any, int]:
+    """Декодирование курсора в (order_by, desc_order, значение поля, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        order_by, desc_order, value, last_id = (
+            payload["o"],
+            payload["d"],
+            payload["v"],
+            payload["id"],
+        )
+        if payload.get("t") == "datetime":
+            value = datetime.fromisoformat(value)
+    except (binascii.Error, ValueError, TypeError, KeyError) as error:
+        raise ValueError("Invalid cursor") from error
+
+    # Значение попадает в запрос параметром, его тип должен совпадать с полем
+    value_type = CURSOR_VALUE_TYPES.get(order_by) if isinstance(order_by, str) else None
+    if (
+        value_type is None
+        or not isinstance(value, value_type)
+        or isinstance(value, bool)
+        or not isinstance(last_id, int)
+        or isinstance(last_id, bool)
+    ):
+        raise ValueError("Invalid cursor")
+
+    return order_by, bool(desc_order), value, last_id
+
+
+def get_next_cursor(
+    realtys: Sequence[Any],
+    filter_query: "PaginationFilter",
+) -> str | None:
+    """Курсор следующей страницы или None, если страница последняя"""
+    order_by = filter_query.order_by
+    if len(realtys) < filter_query.limit or order_by is None:
+        return None
+    if order_by in ("relevance", "distance"):
+        return None
+
+    last_realty = realtys[-1]
+    return encode_cursor(
+        order_by,
+        filter_query.desc_order,
+        getattr(last_realty, order_by),
+        last_realty.id,
+    )
+
+
+def get_pagination_headers(
+    page: RealtyPage[Any],
+    filter_query: "PaginationFilter",
+) -> dict[str, str]:
+    """Заголовки X-Total-Count и X-Next-Cursor для страницы"""
+    headers: dict[str, str] = {}
+    if (total_header := page.total_header) is not None:
+        headers["X-Total-Count"] = total_header
+    if next_cursor := get_next_cursor(page.items, filter_query):
+        headers["X-Next-Cursor"] = next_cursor
+
+    return headers
+
+
+def get_validators(
+    realty_id: int, update_at: datetime, image_count: int, image_checksum: int
+) -> dict[str, str]:
+    """Заголовки ETag и Last-Modified версии объявления. Версия зависит от времени
+    изменения и набора фото (количество и id с учётом позиций)"""
+    update_at = update_at.replace(tzinfo=UTC)
+    version = f"{realty_id}:{update_at.isoformat()}:{image_count}:{image_checksum}"
+    etag = hashlib.sha1(version.encode()).hexdigest()
+
+    return {
+        "ETag": f'"{etag}"',
+        "Last-Modified": format_datetime(update_at, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def is_not_modified(request: Request, validators: dict[str, str]) -> bool:
+    """Проверка условных заголовков запроса: If-None-Match имеет приоритет над
+    If-Modified-Since"""
+    if (if_none_match := request.headers.get("If-None-Match")) is not None:
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        return "*" in etags or validators["ETag"] in etags
+
+    if (if_modified_since := request.headers.get("If-Modified-Since")) is not None:
+        try:
+            modified_since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Дата в формате asctime или со смещением -0000 разбирается без часового
+        # пояса, HTTP-даты всегда в UTC
+        if modified_since.tzinfo is None:
+            modified_since = modified_since.replace(tzinfo=UTC)
+        last_modified = parsedate_to_datetime(validators["Last-Modified"])
+        return last_modified <= modified_since
+
+    return False
@@ -1,23 +1,51 @@
+from tempfile import SpooledTemporaryFile
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, Response, status
+from fastapi import APIRouter, Depends, Path, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
-from src.auth.dependencies import get_current_user, get_current_user_or_none
+from src.auth.dependencies import (
+    get_current_user,
+    get_current_user_or_none,
+    get_read_session,
+)
 from src.core.database import get_session
+from src.exceptions import NotFound
+from src.realty import bulk, export
+from src.realty.cache import CachedResponse, listing_cache
+from src.realty.constants import BULK_IMPORT_RESULTS_SPOOL_SIZE
 from src.realty.crud import realty_crud
 from src.realty.dependecies import (
+    get_existing_realty_id,
     get_realty_by_id,
     get_realty_by_id_for_current_user,
 )
 from src.realty.models import Realty
 from src.realty.schemas import (
+    CitySchema,
+    RealtySchemaCluster,
+    RealtySchemaClusterFilter,
     RealtySchemaCreate,
+    RealtySchemaExportFilter,
+    RealtySchemaFavoritesFilter,
+    RealtySchemaFavoritesSync,
     RealtySchemaFilter,
     RealtySchemaFull,
     RealtySchemaShort,
     RealtySchemaUpdate,
 )
+from src.realty.serialization import (
+    dump_realtys,
+    realtys_short_from_rows,
+)
+from src.realty.utils import (
+    get_pagination_headers,
+    get_validators,
+    is_not_modified,
+)
 from src.user.models import User
 
 router = APIRouter(
@@ -27,26 +55,104 @@ router = APIRouter(
 
 @router.get("/", response_model=list[RealtySchemaShort])
 async def get_realtys(
-    response: Response,
     filter_query: Annotated[RealtySchemaFilter, Query()],
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user: User | None = Depends(get_current_user_or_none),
-) -> list[Realty]:
+) -> Response:
+    # Страница общая для всех пользователей и отдаётся из кэша без обращения к БД.
+    # Кэш заполняется только чтениями из реплики: автор недавних изменений читает
+    # основную БД мимо кэша, иначе получил бы страницу из отстающей реплики
+    use_cache = not session.info.get("read_your_writes", False)
+    cache_key = listing_cache.make_key(filter_query)
+    cached_response = listing_cache.get(cache_key) if use_cache else None
+    if cached_response is None:
+        page = await realty_crud.get_list(session, filter_query)
+        realtys_out = realtys_short_from_rows(page.items)
+        cached_response = CachedResponse(
+            body=dump_realtys(realtys_out),
+            headers=get_pagination_headers(page, filter_query),
+            realtys=realtys_out,
+        )
+        if use_cache:
+            listing_cache.set(cache_key, cached_response)
+
+    body = cached_response.body
     if current_user:
-        realtys = await realty_crud.get_list_with_is_favorite(
+        # Признак избранного - одним запросом по id объявлений страницы
+        favorite_ids = await realty_crud.get_favorite_ids(
             session,
             current_user.id,
-            filter_query,
+            [realty["id"] for realty in cached_response.realtys],
         )
-    else:
-        realtys = await realty_crud.get_list(session, filter_query)
-    total_realtys = await realty_crud.get_count_list(session, filter_query)
-    response.headers["X-Total-Count"] = str(total_realtys)
-    return realtys
+        body = dump_realtys(
+            [
+                {**realty, "is_favorite": realty["id"] in favorite_ids}
+                for realty in cached_response.realtys
+            ]
+        )
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cached_response.headers,
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_realtys(
+    filter_query: Annotated[RealtySchemaExportFilter, Query()],
+    session: AsyncSession = Depends(get_read_session),
+) -> StreamingResponse:
+    """Выгрузка всех объявлений по фильтру в NDJSON или CSV"""
+    export_format = filter_query.format
+    return StreamingResponse(
+        export.export_realtys(session, filter_query),
+        media_type=export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="realtys.{export_format}"'
+        },
+    )
+
+
+@router.get("/cities", response_model=list[CitySchema])
+async def get_cities(
+    prefix: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[int, Query(gt=0, le=50)] = 10,
+    session: AsyncSession = Depends(get_read_session),
+) -> list[RowMapping]:
+    """Автодополнение города: самые популярные города, начинающиеся с префикса"""
+    return await realty_crud.get_cities(session, prefix, limit)
+
+
+@router.get("/clusters", response_model=list[RealtySchemaCluster])
+async def get_clusters(
+    filter_query: Annotated[RealtySchemaClusterFilter, Query()],
+    session: AsyncSession = Depends(get_read_session),
+) -> list[RowMapping]:
+    """Кластеры объявлений для карты: количество, центр и диапазон цен по ячейкам
+    сетки в прямоугольнике bbox для уровня zoom"""
+    return await realty_crud.get_clusters(session, filter_query)
 
 
 @router.get("/{realty_id}/", response_model=RealtySchemaFull)
-async def get_realty(realty: Realty = Depends(get_realty_by_id)) -> Realty:
+async def get_realty(
+    request: Request,
+    response: Response,
+    realty_id: Annotated[int, Path(gt=0)],
+    session: AsyncSession = Depends(get_read_session),
+) -> Realty | Response:
+    """Получение объявления. Если у клиента актуальная версия, возвращается 304 без
+    загрузки объявления с фото и владельцем"""
+    version = await realty_crud.get_version(session, realty_id)
+    if version is None:
+        raise NotFound(detail=f"Realty id={realty_id} not found")
+
+    validators = get_validators(realty_id, *version)
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+
+    realty = await get_realty_by_id(realty_id, session)
+    response.headers.update(validators)
     return realty
 
 
@@ -64,6 +170,28 @@ async def create_realty(
     return new_realty
 
 
+@router.post("/bulk", response_class=StreamingResponse)
+async def import_realtys(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """Массовый импорт объявлений из NDJSON: по объявлению в строке. Ответ - NDJSON
+    с результатом каждой строки"""
+    results = SpooledTemporaryFile(max_size=BULK_IMPORT_RESULTS_SPOOL_SIZE)
+    await bulk.import_realtys(session, request.stream(), current_user.id, results)
+    results.seek(0)
+
+    # Ответ возвращается напрямую, поэтому cookie отметки изменений переносится явно
+    return StreamingResponse(
+        results,
+        headers=response.headers,
+        media_type="application/x-ndjson",
+        background=BackgroundTask(results.close),
+    )
+
+
 @router.patch("/{realty_id}/", response_model=RealtySchemaFull)
 async def update_realty(
     realty_in: RealtySchemaUpdate,
@@ -88,29 +216,44 @@ async def delete_realty(
     response_model=list[RealtySchemaShort],
 )
 async def get_favorites_realty(
-    response: Response,
+    filter_query: Annotated[RealtySchemaFavoritesFilter, Query()],
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+) -> Response:
+    page = await realty_crud.get_favorites(session, current_user.id, filter_query)
+    return Response(
+        content=dump_realtys(realtys_short_from_rows(page.items)),
+        media_type="application/json",
+        headers=get_pagination_headers(page, filter_query),
+    )
+
+
+@router.put("/favorites", response_model=RealtySchemaFavoritesSync)
+async def sync_favorites_realty(
+    favorites_in: RealtySchemaFavoritesSync,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
-) -> list[Realty]:
-    favorites = await realty_crud.get_favorites(session, current_user.id)
-    total_favorites = await realty_crud.get_count_favorites(session, current_user.id)
-    response.headers["X-Total-Count"] = str(total_favorites)
-    return favorites
+) -> RealtySchemaFavoritesSync:
+    """Замена избранного переданным списком id объявлений"""
+    realty_ids = await realty_crud.sync_favorites(
+        session, current_user.id, favorites_in.realty_ids
+    )
+    return RealtySchemaFavoritesSync(realty_ids=realty_ids)
 
 
 @router.post("/favorites/{realty_id}/", status_code=status.HTTP_201_CREATED)
 async def follow_realty(
     current_user: User = Depends(get_current_user),
-    realty: Realty = Depends(get_realty_by_id),
+    realty_id: int = Depends(get_existing_realty_id),
     session: AsyncSession = Depends(get_session),
 ) -> None:
-    await realty_crud.follow_favorite(session, current_user.id, realty.id)
+    await realty_crud.follow_favorite(session, current_user.id, realty_id)
 
 
 @router.delete("/favorites/{realty_id}/", status_code=status.HTTP_204_NO_CONTENT)
 async def unfollow_realty(
     current_user: User = Depends(get_current_user),
-    realty: Realty = Depends(get_realty_by_id),
+    realty_id: int = Depends(get_existing_realty_id),
     session: AsyncSession = Depends(get_session),
 ) -> None:
-    await realty_crud.unfollow_favorite(session, current_user.id, realty.id)
+    await realty_crud.unfollow_favorite(session, current_user.id, realty_id)
@@ -1,12 +1,23 @@
-from typing import cast
+import asyncio
+from typing import Any, cast
 
 from sqlalchemy import Result, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import make_transient_to_detached, selectinload
 
+from src.auth.security import password_hasher
+from src.config import settings
+from src.core.cache import TTLCache
+from src.realty.cache import listing_cache
 from src.user.models import User
 from src.user.schemas import UserSchemaCreate, UserSchemaUpdate
 
+# Значения столбцов пользователей по id для аутентификации без запроса к БД
+user_cache: TTLCache[int, dict[str, Any]] = TTLCache(
+    maxsize=settings.cache.USER_CACHE_SIZE,
+    ttl=settings.cache.USER_CACHE_TTL_SECONDS,
+)
+
 
 class CRUDUser:
     @staticmethod
@@ -15,6 +26,25 @@ class CRUDUser:
 
         return user
 
+    async def get_cached(self, session: AsyncSession, user_id: int) -> User | None:
+        """Получение пользователя из кэша, а при промахе - из БД с записью в кэш"""
+        user_columns = user_cache.get(user_id)
+        if user_columns is not None:
+            # Восстанавливаем пользователя как загруженного и добавляем в сессию
+            # без SELECT, сохраняя единственность объекта в identity map
+            cached_user = User(**user_columns)
+            make_transient_to_detached(cached_user)
+            return await session.merge(cached_user, load=False)
+
+        user = await self.get(session, user_id)
+        if user is not None:
+            user_cache.set(
+                user_id,
+                {column.key: getattr(user, column.key) for column in User.__table__.c},
+            )
+
+        return user
+
     @staticmethod
     async def get_with_favorites(session: AsyncSession, user_id: int) -> User:
         stmt = select(User).filter_by(id=user_id).options(selectinload(User.favorites))
@@ -49,7 +79,8 @@ class CRUDUser:
         session: AsyncSession,
         user_in: UserSchemaCreate,
     ) -> User:
-        new_user = User(**user_in.model_dump())
+        hashed_password = await password_hasher.hash(user_in.password)
+        new_user = User(**user_in.model_dump(), hashed_password=hashed_password)
         session.add(new_user)
         await session.commit()
 
@@ -60,7 +91,14 @@ class CRUDUser:
         session: AsyncSession,
         users_in: list[UserSchemaCreate],
     ) -> list[User]:
-        new_users: list[User] = [User(**user_in.model_dump()) for user_in in users_in]
+        # Пароли хешируются параллельно в пуле потоков password_hasher
+        hashed_passwords = await asyncio.gather(
+            *(password_hasher.hash(user_in.password) for user_in in users_in)
+        )
+        new_users: list[User] = [
+            User(**user_in.model_dump(), hashed_password=hashed_password)
+            for user_in, hashed_password in zip(users_in, hashed_passwords, strict=True)
+        ]
         session.add_all(new_users)
         await session.commit()
 
@@ -75,7 +113,10 @@ class CRUDUser:
         for name, value in user_in.model_dump(exclude_none=True).items():
             if getattr(user, name) != value:
                 setattr(user, name, value)
+        if user_in.password:
+            user.hashed_password = await password_hasher.hash(user_in.password)
         await session.commit()
+        user_cache.pop(user.id)
 
         return user
 
@@ -83,6 +124,9 @@ class CRUDUser:
     async def delete(session: AsyncSession, user: User) -> None:
         await session.delete(user)
         await session.commit()
+        user_cache.pop(user.id)
+        # Объявления пользователя удаляются каскадно
+        listing_cache.bump_version()
 
 
 user_crud = CRUDUser()
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import (
     check_update_email_is_exists,
     get_current_user,
+    get_read_session,
     get_user_by_id_for_current_user,
 )
 from src.core.database import get_session
 from src.realty.crud import realty_crud
-from src.realty.models import Realty
-from src.realty.schemas import RealtySchemaShort
+from src.realty.schemas import RealtySchemaShort, RealtySchemaUserFilter
+from src.realty.serialization import dump_realtys, realtys_short_from_rows
+from src.realty.utils import get_pagination_headers
 from src.user.crud import user_crud
 from src.user.models import User
 from src.user.schemas import UserSchema, UserSchemaUpdate
@@ -19,10 +23,16 @@ router = APIRouter(tags=["User"])
 
 @router.get("/me/realtys", response_model=list[RealtySchemaShort])
 async def get_users_realtys(
-    session: AsyncSession = Depends(get_session),
+    filter_query: Annotated[RealtySchemaUserFilter, Query()],
+    session: AsyncSession = Depends(get_read_session),
     current_user: User = Depends(get_current_user),
-) -> list[Realty]:
-    return await realty_crud.get_created_user(session, current_user.id)
+) -> Response:
+    page = await realty_crud.get_created_user(session, current_user.id, filter_query)
+    return Response(
+        content=dump_realtys(realtys_short_from_rows(page.items)),
+        media_type="application/json",
+        headers=get_pagination_headers(page, filter_query),
+    )
 
 
 @router.get("/me/", response_model=UserSchema)
@@ -5,13 +5,15 @@ import pytest
 from sqlalchemy import StaticPool
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from src.auth.dependencies import token_cache
 from src.config import settings
 from src.core.database import Base
 from src.fake_generators import ImageFake, RealtyFake, UserFake
+from src.realty.cache import listing_cache
 from src.realty.crud import realty_crud
 from src.realty.models import Realty, RealtyType, UserRealtyFavorite
 from src.realty.schemas import RealtySchemaCreate
-from src.user.crud import user_crud
+from src.user.crud import user_cache, user_crud
 from src.user.models import User
 from src.user.schemas import UserSchemaCreate
 
@@ -35,6 +37,10 @@ async def session_fixture() -> AsyncGenerator[AsyncSession, None]:
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    # Кэши переживают тест, а БД создаётся заново
+    user_cache.clear()
+    token_cache.clear()
+    listing_cache.clear()
 
     async with test_session_factory() as session:
         yield session
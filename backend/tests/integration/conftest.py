@@ -4,6 +4,7 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth.dependencies import get_read_session
 from src.core.database import get_session
 from src.fake_generators import UserFake
 from src.main import app
@@ -17,6 +18,7 @@ async def client(session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
 
     async with AsyncClient(
         transport=ASGITransport(app=app),
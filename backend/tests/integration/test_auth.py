@@ -1,8 +1,14 @@
+import asyncio
+import threading
 from dataclasses import asdict
 
+import pytest
 from httpx import AsyncClient
 
+from src.auth import security
 from src.auth.schemas import Token
+from src.auth.security import PasswordHasher, hash_password
+from src.config import settings
 from src.fake_generators import UserFake
 from src.user.models import User
 from tests.integration.utils import login, make_request_and_check_unauthorized
@@ -101,3 +107,61 @@ async def test_error_reissue_token_with_access_token(
         url="/auth/jwt/refresh",
         headers=auth_access_headers_1,
     )
+
+
+async def test_password_hasher_bounded_concurrency(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест на ограничение одновременных bcrypt-операций и учёт очереди, в том
+    числе при отмене ожидающей операции"""
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    def blocking_hash_password(password: str) -> bytes:
+        started.release()
+        release.wait()
+        return hash_password(password)
+
+    monkeypatch.setattr(security, "hash_password", blocking_hash_password)
+    hasher = PasswordHasher(max_workers=2)
+    tasks = [asyncio.create_task(hasher.hash(f"secret{i}")) for i in range(4)]
+    # Оба потока пула взяли по операции, остальные ждут в очереди
+    for _ in range(2):
+        await asyncio.to_thread(started.acquire)
+
+    assert hasher.running == 2
+    assert hasher.queue_depth == 2
+
+    tasks[-1].cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tasks[-1]
+    assert hasher.queue_depth == 1
+
+    release.set()
+    hashed_passwords = await asyncio.gather(*tasks[:-1])
+    assert hasher.stats() == {"max_workers": 2, "queue_depth": 0, "running": 0}
+    assert await hasher.validate("secret0", hashed_passwords[0])
+    assert not await hasher.validate("secret0", hashed_passwords[1])
+    hasher.shutdown()
+
+
+async def test_metrics_access(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест на доступ к метрикам только по токену из настроек"""
+    response = await client.get(url="/metrics")
+    assert response.status_code == 404
+
+    monkeypatch.setattr(settings.security, "METRICS_TOKEN", "metrics-secret")
+    response = await client.get(url="/metrics")
+    assert response.status_code == 401
+    response = await client.get(
+        url="/metrics", headers={"Authorization": "Bearer wrong"}
+    )
+    assert response.status_code == 403
+    response = await client.get(
+        url="/metrics", headers={"Authorization": "Bearer metrics-secret"}
+    )
+    assert response.status_code == 200
+    assert "password_hasher" in response.json()
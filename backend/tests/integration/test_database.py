@@ -0,0 +1,168 @@
+import time
+from collections.abc import AsyncGenerator
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+from fastapi import Response
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.auth.dependencies import token_cache
+from src.config import DbSettings
+from src.core import database
+from src.core.database import Base, ReadYourWritesTracker, get_engine
+from src.fake_generators import RealtyFake, UserFake
+from src.main import app
+from src.realty.cache import listing_cache
+from src.user.crud import user_cache, user_crud
+from src.user.schemas import UserSchemaCreate
+from tests.integration.utils import auth_headers
+
+
+async def test_sqlite_engine_profile(tmp_path: Path) -> None:
+    """Тест на настройки пула и PRAGMA для файловой SQLite"""
+    db_settings = DbSettings(
+        DATABASE_URL=f"sqlite+aiosqlite:///{tmp_path}/db.sqlite",
+        POOL_SIZE=3,
+    )
+    engine = get_engine(db_settings)
+    try:
+        assert engine.pool.size() == 3  # type: ignore[attr-defined]
+        async with engine.connect() as conn:
+            pragmas = {
+                name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                for name in (
+                    "journal_mode",
+                    "synchronous",
+                    "cache_size",
+                    "busy_timeout",
+                )
+            }
+    finally:
+        await engine.dispose()
+
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "cache_size": db_settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": db_settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def test_memory_sqlite_engine_without_pool_settings() -> None:
+    """Тест на создание движка SQLite в памяти без параметров пула"""
+    engine = get_engine(DbSettings(DATABASE_URL="sqlite+aiosqlite://"))
+    assert isinstance(engine.pool, StaticPool)
+
+
+@pytest.fixture
+async def replica_client(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_user_1: UserFake,
+) -> AsyncGenerator[AsyncClient, None]:
+    """Клиент с основной БД и репликой в двух файлах SQLite. Репликация не
+    настроена, поэтому реплика остаётся пустой - как сильно отставшая"""
+    engines = [
+        get_engine(DbSettings(DATABASE_URL=f"sqlite+aiosqlite:///{tmp_path}/{name}"))
+        for name in ("primary.db", "replica.db")
+    ]
+    primary_factory, replica_factory = (
+        async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        for engine in engines
+    )
+    for engine in engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(database, "session_factory", primary_factory)
+    monkeypatch.setattr(database, "read_session_factory", replica_factory)
+    for cache in (user_cache, token_cache, listing_cache):
+        cache.clear()
+
+    async with primary_factory() as session:
+        await user_crud.create_many(session, [UserSchemaCreate(**asdict(fake_user_1))])
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+    for engine in engines:
+        await engine.dispose()
+
+
+def test_read_your_writes_tracker_shared_by_workers() -> None:
+    """Тест на проверку отметки об изменениях другим экземпляром трекера, как в
+    соседнем воркере"""
+    writer = ReadYourWritesTracker(cookie_name="last_write_at", window_seconds=5)
+    reader = ReadYourWritesTracker(cookie_name="last_write_at", window_seconds=5)
+    response = Response()
+    writer.mark(response)
+    cookie = response.headers["set-cookie"]
+    assert "HttpOnly" in cookie
+    assert "Max-Age=5" in cookie
+    cookies = {"last_write_at": cookie.split(";")[0].split("=")[1]}
+
+    assert reader.is_recent(cookies)
+    assert not reader.is_recent({})
+    assert not reader.is_recent({"last_write_at": "invalid"})
+    assert not reader.is_recent({"last_write_at": str(time.time() - 5)})
+
+
+async def test_read_replica_routing(
+    replica_client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_user_1: UserFake,
+    fake_realty_1: RealtyFake,
+) -> None:
+    """Тест на чтение из реплики и чтение своих изменений из основной БД"""
+    headers = await auth_headers(replica_client, fake_user_1, "access_token")
+    response = await replica_client.post(
+        url="/realtys/", json=asdict(fake_realty_1), headers=headers
+    )
+    assert response.status_code == 201
+    realty_id = response.json()["id"]
+    url = f"/realtys/{realty_id}/"
+
+    # Отметка об изменении приходит автору в cookie
+    cookie_name = database.read_your_writes.cookie_name
+    author_headers = {
+        **headers,
+        "cookie": f"{cookie_name}={response.cookies[cookie_name]}",
+    }
+    replica_client.cookies.clear()
+
+    # Автор сразу видит своё объявление, остальные читают отстающую реплику
+    response = await replica_client.get(url=url, headers=author_headers)
+    assert response.status_code == 200
+    response = await replica_client.get(url=url, headers=headers)
+    assert response.status_code == 404
+
+    # Страница поиска, закэшированная из реплики, не скрывает от автора его
+    # объявление
+    response = await replica_client.get(url="/realtys/")
+    assert response.json() == []
+    response = await replica_client.get(url="/realtys/", headers=author_headers)
+    assert [realty_out["id"] for realty_out in response.json()] == [realty_id]
+
+    # Отметку проверяет и другой воркер со своим экземпляром трекера
+    monkeypatch.setattr(
+        database,
+        "read_your_writes",
+        ReadYourWritesTracker(
+            cookie_name=cookie_name,
+            window_seconds=database.read_your_writes.window_seconds,
+        ),
+    )
+    response = await replica_client.get(url=url, headers=author_headers)
+    assert response.status_code == 200
+
+    # После окна read-your-writes автор тоже читает из реплики
+    expired_written_at = time.time() - database.read_your_writes.window_seconds
+    author_headers["cookie"] = f"{cookie_name}={expired_written_at}"
+    response = await replica_client.get(url=url, headers=author_headers)
+    assert response.status_code == 404
+    response = await replica_client.get(url="/realtys/", headers=author_headers)
+    assert response.json() == []
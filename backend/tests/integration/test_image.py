@@ -0,0 +1,83 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.image.models import ImageDeletion
+from src.image.outbox import ImageDeletionWorker
+from src.realty.crud import realty_crud
+from src.realty.models import Realty
+
+
+class FakeCloudinary:
+    """Фейковый бэкенд удаления фото, запоминающий вызовы"""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.calls: list[list[str]] = []
+
+    def delete_images(self, public_ids: list[str]) -> None:
+        self.calls.append(public_ids)
+        if self.fail:
+            raise ConnectionError("Cloudinary is unavailable")
+
+
+async def get_deletions(session: AsyncSession) -> list[ImageDeletion]:
+    result = await session.execute(select(ImageDeletion).order_by(ImageDeletion.id))
+    return list(result.scalars().all())
+
+
+async def test_success_image_deletions_drained_in_batches(
+    session: AsyncSession,
+    realtys: list[Realty],
+) -> None:
+    """Тест на запись удалений фото в outbox и их отправку пачками"""
+    realty = await realty_crud.get(session, realtys[0].id)
+    assert realty is not None
+    public_ids = [image.public_id for image in realty.images]
+    await realty_crud.delete(session, realty)
+
+    deletions = await get_deletions(session)
+    assert [deletion.public_id for deletion in deletions] == public_ids
+
+    fake_cloudinary = FakeCloudinary()
+    worker = ImageDeletionWorker(
+        session_factory=async_sessionmaker(bind=session.bind, expire_on_commit=False),
+        delete_images=fake_cloudinary.delete_images,
+        batch_size=2,
+    )
+    assert await worker.process_batch() == 2
+    assert await worker.process_batch() == 1
+    assert await worker.process_batch() == 0
+
+    assert fake_cloudinary.calls == [public_ids[:2], public_ids[2:]]
+    session.expire_all()
+    assert await get_deletions(session) == []
+
+
+async def test_error_image_deletions_retried_with_backoff(
+    session: AsyncSession,
+    realtys: list[Realty],
+) -> None:
+    """Тест на повтор неудачного удаления фото с экспоненциальной задержкой"""
+    realty = await realty_crud.get(session, realtys[0].id)
+    assert realty is not None
+    await realty_crud.delete(session, realty)
+
+    fake_cloudinary = FakeCloudinary(fail=True)
+    worker = ImageDeletionWorker(
+        session_factory=async_sessionmaker(bind=session.bind, expire_on_commit=False),
+        delete_images=fake_cloudinary.delete_images,
+        backoff=timedelta(minutes=1),
+    )
+    started_at = datetime.now(tz=UTC).replace(tzinfo=None)
+    assert await worker.process_batch() == 3
+    # Записи отложены, поэтому следующая пачка пуста
+    assert await worker.process_batch() == 0
+    assert len(fake_cloudinary.calls) == 1
+
+    session.expire_all()
+    for deletion in await get_deletions(session):
+        assert deletion.attempts == 1
+        assert deletion.next_attempt_at >= started_at + timedelta(minutes=1)
+        assert deletion.last_error is not None
@@ -0,0 +1,76 @@
+import re
+from typing import Any
+
+import pytest
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.realty.crud import realty_crud
+from src.realty.models import UserRealtyFavorite
+from src.realty.schemas import RealtySchemaFilter
+from src.realty.utils import encode_cursor
+
+# Полный проход по таблице (в том числе по всему индексу) вместо поиска по индексу
+FULL_SCAN = re.compile(r"^SCAN (realtys|images|images_1|user_realty_favorites)\b")
+
+
+async def explain(session: AsyncSession, stmt: Select[Any]) -> list[str]:
+    """План выполнения запроса SQLite построчно"""
+    connection = await session.connection()
+    sql = stmt.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    return [row.detail for row in result]
+
+
+@pytest.mark.parametrize(
+    "params, expected_index",
+    [
+        ({"count": "none"}, "ix_realtys_is_active_created_at"),
+        ({}, None),
+        ({"order_by": "price", "desc_order": False}, None),
+        ({"min_price": 1000, "max_price": 2000}, "ix_realtys_is_active_price"),
+        (
+            {"type": "APARTMENT", "rooms": 2, "min_price": 1000},
+            "ix_realtys_is_active_type_rooms_price",
+        ),
+        ({"with_photos": True}, "ix_realtys_is_active_image_count"),
+        ({"city": "la"}, None),
+        ({"city": "land"}, None),
+        ({"q": "flat"}, None),
+        ({"bbox": "50,30,51,31"}, "realty_geo"),
+        ({"near": "50.45,30.52"}, "realty_geo"),
+        ({"count": "capped"}, None),
+        (
+            {"order_by": "price", "cursor": encode_cursor("price", True, 1500, 2)},
+            None,
+        ),
+    ],
+)
+async def test_realtys_list_uses_indexes(
+    session: AsyncSession,
+    params: dict[str, Any],
+    expected_index: str | None,
+) -> None:
+    """Тест на то, что поиск объявлений не переходит к полному сканированию таблиц"""
+    plan = await explain(
+        session, realty_crud.get_list_stmt(RealtySchemaFilter(**params))
+    )
+
+    assert not [line for line in plan if FULL_SCAN.match(line)], plan
+    # Титульное фото хранится в объявлении, таблица фото не читается
+    assert not [line for line in plan if "images" in line], plan
+    if expected_index is not None:
+        assert any(expected_index in line for line in plan), plan
+
+
+async def test_favorite_ids_uses_index(session: AsyncSession) -> None:
+    """Тест на поиск избранных среди объявлений страницы по уникальному индексу"""
+    stmt = select(UserRealtyFavorite.realty_id).filter(
+        UserRealtyFavorite.user_id == 1,
+        UserRealtyFavorite.realty_id.in_([1, 2, 3]),
+    )
+    plan = await explain(session, stmt)
+
+    assert not [line for line in plan if FULL_SCAN.match(line)], plan
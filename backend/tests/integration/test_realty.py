@@ -1,10 +1,24 @@
-from dataclasses import asdict
+import base64
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from dataclasses import asdict, replace
+from datetime import UTC, datetime, timedelta
+from typing import Any
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.fake_generators import RealtyFake
-from src.realty.models import Realty, RealtyType
+from src.realty.backfill import backfill_image_count, backfill_title_image
+from src.realty.cache import listing_cache
+from src.realty.crud import realty_crud
+from src.realty.models import Realty, RealtyType, UserRealtyFavorite
+from src.realty.schemas import RealtySchemaCreate, RealtySchemaUpdate
+from src.user.models import User
 from tests.integration.utils import (
     compare_ids_favorites_realtys_in_out,
     compare_realtys_in_out,
@@ -16,8 +30,8 @@ async def test_success_get_realtys_unauthorized(
     realtys: list[Realty],
     fake_realtys: list[RealtyFake],
 ) -> None:
-    """Тест на получение объявлений"""
-    active_fake_realtys = [realty for realty in fake_realtys if realty.is_active]
+    """Тест на получение объявлений: по умолчанию новые первыми"""
+    active_fake_realtys = [realty for realty in fake_realtys if realty.is_active][::-1]
 
     response = await client.get(url="/realtys/")
 
@@ -45,7 +59,7 @@ async def test_success_get_realtys_authorized(
 ) -> None:
     """Тест на получение объявлений"""
     is_favorites = [
-        realty in favorites_realtys for realty in realtys if realty.is_active
+        realty in favorites_realtys for realty in realtys[::-1] if realty.is_active
     ]
     active_fake_realtys = [realty for realty in fake_realtys if realty.is_active]
 
@@ -67,10 +81,13 @@ async def test_success_get_realtys_authorized(
 @pytest.mark.parametrize(
     "params, expected_ids, expected_total",
     [
-        ({"is_active": False}, [1, 2, 3, 4, 5, 6], 6),
+        ({"is_active": False}, [6, 5, 4, 3, 2, 1], 6),
         ({"limit": 2, "offset": 2, "order_by": "price", "desc_order": True}, [2, 1], 5),
         ({"min_price": 1100, "max_price": 1900, "order_by": "price"}, [2, 1, 3], 3),
         ({"city": "LANd", "order_by": "price", "desc_order": True}, [2, 1, 3], 3),
+        ({"city": " new  YORK ", "is_active": False}, [5], 1),
+        ({"city": "Ky"}, [6], 1),
+        ({"city": '"%_'}, [], 0),
         (
             {"with_photos": True, "order_by": "price", "type": RealtyType.APARTMENT},
             [2, 1],
@@ -94,6 +111,395 @@ async def test_search_realtys(
     assert int(response.headers.get("x-total-count")) == expected_total
 
 
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"limit": 2},
+        {"limit": 2, "order_by": "price", "desc_order": False},
+        {"limit": 1, "is_active": False, "order_by": "price"},
+    ],
+)
+async def test_search_realtys_by_cursor(
+    client: AsyncClient,
+    realtys: list[Realty],
+    params: dict[str, int | str | bool],
+) -> None:
+    """Тест на постраничное получение объявлений по курсору"""
+    response = await client.get(url="/realtys/", params={**params, "limit": 100})
+    expected_ids = [realty_out["id"] for realty_out in response.json()]
+
+    realtys_out_ids: list[int] = []
+    cursor: str | None = None
+    while True:
+        page_params = params if cursor is None else {**params, "cursor": cursor}
+        response = await client.get(url="/realtys/", params=page_params)
+        assert response.status_code == 200
+        assert int(response.headers.get("x-total-count")) == len(expected_ids)
+
+        realtys_out_ids.extend(realty_out["id"] for realty_out in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert realtys_out_ids == expected_ids
+
+
+@pytest.mark.parametrize("desc_order", [True, False])
+async def test_search_realtys_by_cursor_with_ties(
+    client: AsyncClient,
+    session: AsyncSession,
+    users: list[User],
+    desc_order: bool,
+) -> None:
+    """Тест на курсор по объявлениям с равной ценой: порядок задаёт id в том же
+    направлении, что и цена"""
+    for price in (1000, 2000, 1000, 1000, 2000):
+        realty_in = RealtySchemaCreate(**asdict(RealtyFake(price=price)))
+        await realty_crud.create(session, realty_in, users[0].id)
+    params: dict[str, int | str | bool] = {
+        "limit": 2,
+        "order_by": "price",
+        "desc_order": desc_order,
+    }
+
+    realtys_out_ids: list[int] = []
+    cursor: str | None = None
+    while True:
+        page_params = params if cursor is None else {**params, "cursor": cursor}
+        response = await client.get(url="/realtys/", params=page_params)
+        realtys_out_ids.extend(realty_out["id"] for realty_out in response.json())
+        if (cursor := response.headers.get("x-next-cursor")) is None:
+            break
+
+    assert realtys_out_ids == ([5, 2, 4, 3, 1] if desc_order else [1, 3, 4, 2, 5])
+
+
+async def test_error_search_realtys_invalid_cursor(
+    client: AsyncClient,
+    realtys: list[Realty],
+) -> None:
+    """Тест на ошибку поиска по некорректному курсору или курсору другой сортировки"""
+    response = await client.get(url="/realtys/", params={"cursor": "invalid"})
+    assert response.status_code == 422
+
+    # Курсор корректного формата, но со значением не того типа
+    for order_by, value in (("price", [1, 2]), ("price", "1"), ("created_at", 1)):
+        payload = {"o": order_by, "d": True, "v": value, "id": 1}
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        response = await client.get(
+            url="/realtys/", params={"cursor": cursor, "order_by": order_by}
+        )
+        assert response.status_code == 422
+
+    response = await client.get(url="/realtys/", params={"limit": 1})
+    cursor = response.headers.get("x-next-cursor")
+    response = await client.get(
+        url="/realtys/", params={"cursor": cursor, "order_by": "price"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "params, expected_total",
+    [
+        ({"count": "exact", "offset": 10}, "5"),
+        ({"count": "capped"}, "3+"),
+        ({"count": "capped", "max_price": 1500}, "2"),
+        ({"count": "none"}, None),
+    ],
+)
+async def test_search_realtys_count_modes(
+    client: AsyncClient,
+    realtys: list[Realty],
+    monkeypatch: pytest.MonkeyPatch,
+    params: dict[str, int | str],
+    expected_total: str | None,
+) -> None:
+    """Тест на режимы подсчёта общего количества объявлений"""
+    monkeypatch.setattr("src.realty.crud.TOTAL_COUNT_CAP", 3)
+
+    response = await client.get(url="/realtys/", params=params)
+
+    assert response.status_code == 200
+    assert response.headers.get("x-total-count") == expected_total
+
+
+async def test_search_realtys_cached(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    realtys: list[Realty],
+    fake_realty_1: RealtyFake,
+) -> None:
+    """Тест на кэширование анонимного поиска и сброс кэша при изменении объявлений"""
+    params: dict[str, str | int] = {
+        "limit": 2,
+        "order_by": "price",
+        "desc_order": "false",
+    }
+    first_response = await client.get(url="/realtys/", params=params)
+    hits = listing_cache.stats()["hits"]
+
+    second_response = await client.get(url="/realtys/", params=params)
+    assert listing_cache.stats()["hits"] == hits + 1
+    assert second_response.content == first_response.content
+    assert second_response.headers["x-total-count"] == "5"
+    assert (
+        second_response.headers["x-next-cursor"]
+        == first_response.headers["x-next-cursor"]
+    )
+
+    # Новое объявление повышает версию каталога, ответ собирается заново
+    fake_realty_cheap = replace(fake_realty_1, price=1)
+    response = await client.post(
+        url="/realtys/",
+        json=asdict(fake_realty_cheap),
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 201
+
+    response = await client.get(url="/realtys/", params=params)
+    assert listing_cache.stats()["hits"] == hits + 1
+    assert response.headers["x-total-count"] == "6"
+    assert response.json()[0]["price"] == 1
+
+
+async def test_search_realtys_cached_with_favorites(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    realtys: list[Realty],
+    favorites_realtys: list[Realty],
+) -> None:
+    """Тест на общий кэш страницы для анонимного и авторизованного поиска"""
+    response = await client.get(url="/realtys/")
+    assert all(realty["is_favorite"] is None for realty in response.json())
+    hits = listing_cache.stats()["hits"]
+
+    response = await client.get(url="/realtys/", headers=auth_access_headers_1)
+    assert listing_cache.stats()["hits"] == hits + 1
+    favorite_ids = {realty.id for realty in favorites_realtys}
+    for realty_out in response.json():
+        assert realty_out["is_favorite"] == (realty_out["id"] in favorite_ids)
+
+    # Признак избранного не кэшируется вместе со страницей
+    realty_id = realtys[-1].id
+    assert realty_id not in favorite_ids
+    response = await client.post(
+        url=f"/realtys/favorites/{realty_id}/",
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 201
+
+    response = await client.get(url="/realtys/", headers=auth_access_headers_1)
+    assert listing_cache.stats()["hits"] == hits + 2
+    realtys_out = {realty["id"]: realty for realty in response.json()}
+    assert realtys_out[realty_id]["is_favorite"] is True
+
+
+async def test_search_realtys_full_text(
+    client: AsyncClient,
+    session: AsyncSession,
+    users: list[User],
+) -> None:
+    """Тест на полнотекстовый поиск с сортировкой по релевантности и синхронизацию
+    индекса при создании, изменении и удалении объявлений"""
+    texts = [
+        ("Cozy loft", "Quiet street"),
+        ("Family house", "Loft-style attic near the park"),
+        ("Office", "Business center"),
+        ("Garage", "Covered parking"),
+        ("Studio", "Bright room"),
+        ("Cottage", "Lake view"),
+    ]
+    new_realtys: list[Realty] = []
+    for title, description in texts:
+        fake_realty = RealtyFake(title=title, description=description, number_images=0)
+        realty_in = RealtySchemaCreate(**asdict(fake_realty))
+        new_realtys.append(await realty_crud.create(session, realty_in, users[0].id))
+    loft, house, office, *_ = new_realtys
+
+    response = await client.get(url="/realtys/", params={"q": "LOFT!"})
+    assert response.status_code == 200
+    assert [realty_out["id"] for realty_out in response.json()] == [loft.id, house.id]
+    assert int(response.headers.get("x-total-count")) == 2
+
+    realty_in_update = RealtySchemaUpdate(title="Loft office", type=office.type)
+    await realty_crud.update(session, office, realty_in_update)
+    await realty_crud.delete(session, loft)
+
+    response = await client.get(url="/realtys/", params={"q": "loft"})
+    assert [realty_out["id"] for realty_out in response.json()] == [office.id, house.id]
+
+    response = await client.get(url="/realtys/", params={"order_by": "relevance"})
+    assert response.status_code == 422
+
+
+async def test_search_realtys_geo(
+    client: AsyncClient,
+    session: AsyncSession,
+    users: list[User],
+) -> None:
+    """Тест на поиск по прямоугольнику и в радиусе от точки с сортировкой по
+    расстоянию и синхронизацию пространственного индекса"""
+    coordinates = [
+        (50.46, 30.53),  # ~1.3 км от центра Киева
+        (50.50, 30.60),  # ~7.7 км
+        (50.00, 30.50),  # ~50 км
+        (49.84, 24.03),  # Львов
+        (None, None),
+    ]
+    new_realtys: list[Realty] = []
+    for latitude, longitude in coordinates:
+        fake_realty = RealtyFake(latitude=latitude, longitude=longitude)
+        realty_in = RealtySchemaCreate(**asdict(fake_realty))
+        new_realtys.append(await realty_crud.create(session, realty_in, users[0].id))
+    near, middle, far, lviv, _ = new_realtys
+    kyiv = {"near": "50.45,30.52"}
+
+    response = await client.get(url="/realtys/", params=kyiv)
+    assert response.status_code == 200
+    assert [realty_out["id"] for realty_out in response.json()] == [near.id, middle.id]
+    assert int(response.headers.get("x-total-count")) == 2
+
+    response = await client.get(url="/realtys/", params={**kyiv, "radius_km": 60})
+    assert [realty_out["id"] for realty_out in response.json()] == [
+        near.id,
+        middle.id,
+        far.id,
+    ]
+
+    response = await client.get(url="/realtys/", params={"bbox": "49.8,24,49.9,24.1"})
+    assert [realty_out["id"] for realty_out in response.json()] == [lviv.id]
+
+    realty_in_update = RealtySchemaUpdate(
+        latitude=49.85, longitude=24.04, type=near.type
+    )
+    await realty_crud.update(session, near, realty_in_update)
+    await realty_crud.delete(session, middle)
+
+    response = await client.get(url="/realtys/", params=kyiv)
+    assert response.json() == []
+    response = await client.get(
+        url="/realtys/",
+        params={"bbox": "49.8,24,49.9,24.1", "order_by": "price", "desc_order": False},
+    )
+    assert {realty_out["id"] for realty_out in response.json()} == {near.id, lviv.id}
+
+    response = await client.get(url="/realtys/", params={"order_by": "distance"})
+    assert response.status_code == 422
+
+
+async def test_get_clusters(
+    client: AsyncClient,
+    session: AsyncSession,
+    users: list[User],
+) -> None:
+    """Тест на кластеры объявлений по ячейкам сетки с учётом фильтров и zoom"""
+    realtys_data = [
+        (50.44, 30.51, 1000),  # Киев
+        (50.45, 30.52, 1500),
+        (50.46, 30.53, 2000),
+        (49.84, 24.03, 1200),  # Львов
+        (46.48, 30.72, 1100),  # Одесса, вне прямоугольника
+    ]
+    for latitude, longitude, price in realtys_data:
+        fake_realty = RealtyFake(latitude=latitude, longitude=longitude, price=price)
+        realty_in = RealtySchemaCreate(**asdict(fake_realty))
+        await realty_crud.create(session, realty_in, users[0].id)
+    # Параметров страницы у кластеров нет, limit не учитывается
+    params: dict[str, Any] = {"bbox": "49,23,51,31", "zoom": 6, "limit": 1}
+
+    response = await client.get(url="/realtys/clusters", params=params)
+    assert response.status_code == 200
+    lviv, kyiv = response.json()
+    assert lviv == {
+        "count": 1,
+        "latitude": 49.84,
+        "longitude": 24.03,
+        "min_price": 1200,
+        "max_price": 1200,
+    }
+    assert kyiv["count"] == 3
+    assert kyiv["latitude"] == pytest.approx(50.45)
+    assert kyiv["longitude"] == pytest.approx(30.52)
+    assert (kyiv["min_price"], kyiv["max_price"]) == (1000, 2000)
+
+    response = await client.get(
+        url="/realtys/clusters", params={**params, "max_price": 1500}
+    )
+    assert [cluster["count"] for cluster in response.json()] == [1, 2]
+
+    response = await client.get(
+        url="/realtys/clusters", params={"bbox": "50.4,30.4,50.5,30.6", "zoom": 12}
+    )
+    assert [cluster["count"] for cluster in response.json()] == [1, 1, 1]
+
+    response = await client.get(url="/realtys/clusters", params={"zoom": 6})
+    assert response.status_code == 422
+    response = await client.get(
+        url="/realtys/clusters", params={"bbox": "-80,-180,80,180", "zoom": 10}
+    )
+    assert response.status_code == 422
+
+
+async def test_export_realtys(
+    client: AsyncClient,
+    realtys: list[Realty],
+    fake_realtys: list[RealtyFake],
+) -> None:
+    """Тест на выгрузку всех объявлений по фильтру в NDJSON и CSV. Параметров
+    страницы у выгрузки нет, они не проверяются и не учитываются"""
+    params: dict[str, str | int] = {
+        "order_by": "price",
+        "desc_order": "false",
+        "limit": 1,
+        "cursor": "invalid",
+    }
+    expected = sorted(
+        (realty for realty in fake_realtys if realty.is_active),
+        key=lambda realty: realty.price,
+    )
+
+    response = await client.get(
+        url="/realtys/export", params={**params, "format": "ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    realtys_out = [json.loads(line) for line in response.text.splitlines()]
+    assert [realty["price"] for realty in realtys_out] == [
+        realty.price for realty in expected
+    ]
+    assert realtys_out[0]["title_image_url"] == expected[0].images[0].url
+
+    response = await client.get(
+        url="/realtys/export", params={**params, "format": "csv"}
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["price"]) for row in rows] == [realty.price for realty in expected]
+    assert rows[0]["title"] == expected[0].title
+
+
+@pytest.mark.parametrize(
+    "prefix, expected_cities",
+    [
+        ("la", [{"city": "Land", "count": 1}]),
+        ("NEW y", [{"city": "New York", "count": 1}]),
+        ("Landf", []),
+    ],
+)
+async def test_get_cities(
+    client: AsyncClient,
+    realtys: list[Realty],
+    prefix: str,
+    expected_cities: list[dict[str, str | int]],
+) -> None:
+    """Тест на автодополнение города среди активных объявлений"""
+    response = await client.get(url="/realtys/cities", params={"prefix": prefix})
+
+    assert response.status_code == 200
+    assert response.json() == expected_cities
+
+
 async def test_success_get_realty(
     client: AsyncClient,
     realtys: list[Realty],
@@ -107,6 +513,55 @@ async def test_success_get_realty(
     compare_realtys_in_out(realty_in=fake_realty_1, realty_out=response.json())
 
 
+async def test_success_get_realty_not_modified(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    realtys: list[Realty],
+) -> None:
+    """Тест на условное получение объявления по ETag и Last-Modified"""
+    url = "/realtys/1/"
+    response = await client.get(url=url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    response = await client.get(url=url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = await client.get(url=url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # Даты в формате asctime и со смещением -0000 сравниваются как UTC
+    for if_modified_since in (
+        "Thu Dec 31 23:59:59 2099",
+        "Thu, 31 Dec 2099 23:59:59 -0000",
+    ):
+        response = await client.get(
+            url=url, headers={"If-Modified-Since": if_modified_since}
+        )
+        assert response.status_code == 304
+    response = await client.get(
+        url=url, headers={"If-Modified-Since": "Sun Nov  6 08:49:37 1994"}
+    )
+    assert response.status_code == 200
+
+    # Перестановка фото меняет версию объявления
+    images = (await client.get(url=url)).json()["images"]
+    response = await client.patch(
+        url=url,
+        json={"type": realtys[0].type, "images": images[::-1]},
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 200
+
+    response = await client.get(url=url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["images"] == images[::-1]
+
+
 async def test_error_get_realty(
     client: AsyncClient,
     realtys: list[Realty],
@@ -133,6 +588,54 @@ async def test_success_create_realty(
     compare_realtys_in_out(realty_in=fake_realty_1, realty_out=response.json())
 
 
+async def test_success_import_realtys(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    users: list[User],
+    fake_realtys: list[RealtyFake],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест на массовый импорт объявлений из NDJSON пачками, слишком длинные
+    строки пропускаются с ошибкой"""
+    monkeypatch.setattr("src.realty.bulk.BULK_IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr("src.realty.bulk.BULK_IMPORT_MAX_LINE_SIZE", 4096)
+    too_long_line = json.dumps({"title": "x" * 10_000})
+    lines = [json.dumps(asdict(fake_realty)) for fake_realty in fake_realtys[:3]]
+    lines[1:1] = ["{not json", "", json.dumps({"title": "No fields"}), too_long_line]
+    # Последняя строка без перевода строки
+    lines.append(too_long_line)
+    body = "\n".join(lines).encode()
+
+    async def stream_body() -> AsyncIterator[bytes]:
+        # Граница чанков посреди строки
+        for start in range(0, len(body), 100):
+            yield body[start : start + 100]
+
+    response = await client.post(
+        url="/realtys/bulk",
+        content=stream_body(),
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 200
+    results = {
+        result["line"]: result for result in map(json.loads, response.text.splitlines())
+    }
+    assert sorted(results) == [1, 2, 4, 5, 6, 7, 8]
+    assert "errors" in results[2] and "errors" in results[4]
+    for line in (5, 8):
+        assert results[line]["errors"][0]["type"] == "line_too_long"
+
+    for line, fake_realty in zip([1, 6, 7], fake_realtys[:3], strict=True):
+        response = await client.get(url="/realtys/", params={"q": fake_realty.title})
+        realty_out = next(
+            realty for realty in response.json() if realty["id"] == results[line]["id"]
+        )
+        compare_realtys_in_out(
+            realty_in=fake_realty, realty_out=realty_out, is_full=False
+        )
+        assert realty_out["user_id"] == users[0].id
+
+
 async def test_success_update_realty(
     client: AsyncClient,
     auth_access_headers_1: dict[str, str],
@@ -153,6 +656,41 @@ async def test_success_update_realty(
         realty_out=response.json(),
         is_update=True,
     )
+    assert realtys[0].image_count == len(fake_realty_update_1.images)
+    # Титульным стало первое фото в новом порядке
+    assert realtys[0].title_image_url == fake_realty_update_1.images[0].url
+
+
+async def test_backfill_images(
+    session: AsyncSession,
+    realtys: list[Realty],
+    fake_realtys: list[RealtyFake],
+) -> None:
+    """Тест на пересчёт количества фото и титульного фото объявлений"""
+    # Данные о фото уже поддерживаются при создании объявлений
+    assert await backfill_image_count(session) == 0
+    assert await backfill_title_image(session) == 0
+
+    await session.execute(
+        update(Realty).values(
+            image_count=0,
+            title_image_id=None,
+            title_image_url=None,
+            title_image_public_id=None,
+        )
+    )
+    await session.commit()
+    realtys_with_photos = [realty for realty in fake_realtys if realty.images]
+    assert await backfill_image_count(session) == len(realtys_with_photos)
+    assert await backfill_title_image(session) == len(realtys_with_photos)
+
+    result = await session.execute(
+        select(Realty.image_count, Realty.title_image_url).order_by(Realty.id)
+    )
+    assert [tuple(row) for row in result] == [
+        (len(realty.images), realty.images[0].url if realty.images else None)
+        for realty in fake_realtys
+    ]
 
 
 async def test_success_delete_realty(
@@ -208,6 +746,7 @@ async def test_success_get_favorites_realtys(
     """Тест на успешное получение избранных объявлений"""
     response = await client.get(
         url="/realtys/favorites",
+        params={"desc_order": False},
         headers=auth_access_headers_1,
     )
     assert response.status_code == 200
@@ -218,6 +757,44 @@ async def test_success_get_favorites_realtys(
     )
 
 
+async def test_success_get_favorites_realtys_by_cursor(
+    client: AsyncClient,
+    session: AsyncSession,
+    auth_access_headers_1: dict[str, str],
+    favorites_realtys: list[Realty],
+) -> None:
+    """Тест на постраничное получение избранного, начиная с последних добавленных"""
+    # Разводим время добавления в избранное: первое объявление добавлено последним
+    base_time = datetime(2024, 1, 1, tzinfo=UTC)
+    for minutes, realty in enumerate(reversed(favorites_realtys)):
+        await session.execute(
+            update(UserRealtyFavorite)
+            .filter_by(user_id=1, realty_id=realty.id)
+            .values(created_at=base_time + timedelta(minutes=minutes))
+        )
+    await session.commit()
+
+    realtys_out: list[dict[str, Any]] = []
+    params: dict[str, str | int] = {"limit": 2}
+    while True:
+        response = await client.get(
+            url="/realtys/favorites",
+            params=params,
+            headers=auth_access_headers_1,
+        )
+        assert response.status_code == 200
+        assert int(response.headers["x-total-count"]) == len(favorites_realtys)
+        realtys_out.extend(response.json())
+        if (cursor := response.headers.get("x-next-cursor")) is None:
+            break
+        params["cursor"] = cursor
+
+    compare_ids_favorites_realtys_in_out(
+        favorites_in=favorites_realtys,
+        favorites_out=realtys_out,
+    )
+
+
 async def test_success_add_favorite_realty(
     client: AsyncClient,
     auth_access_headers_1: dict[str, str],
@@ -235,6 +812,7 @@ async def test_success_add_favorite_realty(
 
     response = await client.get(
         url="/realtys/favorites",
+        params={"desc_order": False},
         headers=auth_access_headers_1,
     )
     assert response.status_code == 200
@@ -261,6 +839,7 @@ async def test_success_delete_favorite_realty(
 
     response = await client.get(
         url="/realtys/favorites",
+        params={"desc_order": False},
         headers=auth_access_headers_1,
     )
     assert response.status_code == 200
@@ -272,10 +851,66 @@ async def test_success_delete_favorite_realty(
     )
 
 
+async def test_follow_unfollow_favorite_idempotent(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    realtys: list[Realty],
+    favorites_realtys: list[Realty],
+) -> None:
+    """Тест на идемпотентность повторного добавления и удаления избранного"""
+    realty_id = realtys[-1].id
+    url = f"/realtys/favorites/{realty_id}/"
+    for _ in range(2):
+        response = await client.post(url=url, headers=auth_access_headers_1)
+        assert response.status_code == 201
+
+    response = await client.get(url="/realtys/favorites", headers=auth_access_headers_1)
+    assert (int(response.headers.get("x-total-count"))) == len(favorites_realtys) + 1
+
+    for _ in range(2):
+        response = await client.delete(url=url, headers=auth_access_headers_1)
+        assert response.status_code == 204
+
+    response = await client.get(url="/realtys/favorites", headers=auth_access_headers_1)
+    assert (int(response.headers.get("x-total-count"))) == len(favorites_realtys)
+
+    response = await client.post(
+        url="/realtys/favorites/1000/", headers=auth_access_headers_1
+    )
+    assert response.status_code == 404
+
+
+async def test_success_sync_favorites_realtys(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    realtys: list[Realty],
+    favorites_realtys: list[Realty],
+) -> None:
+    """Тест на замену избранного списком id: лишние удаляются, новые добавляются,
+    несуществующие пропускаются"""
+    kept_id, added_id = favorites_realtys[0].id, realtys[-1].id
+    response = await client.put(
+        url="/realtys/favorites",
+        json={"realty_ids": [added_id, kept_id, 1000]},
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"realty_ids": [kept_id, added_id]}
+
+    response = await client.put(
+        url="/realtys/favorites",
+        json={"realty_ids": []},
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"realty_ids": []}
+
+
 @pytest.mark.parametrize(
     "url, method",
     [
         ("/realtys/favorites", "get"),
+        ("/realtys/favorites", "put"),
         ("/realtys/favorites/1/", "post"),
         ("/realtys/favorites/1/", "delete"),
         ("/realtys/", "post"),
@@ -1,9 +1,17 @@
-from dataclasses import asdict
+from dataclasses import asdict, replace
+from typing import Any
 
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth.dependencies import token_cache
 from src.fake_generators import RealtyFake, UserFake
+from src.realty.cache import listing_cache
+from src.realty.crud import realty_crud
 from src.realty.models import Realty
+from src.realty.schemas import RealtySchemaCreate
+from src.user.crud import user_cache, user_crud
+from src.user.models import User
 from tests.integration.utils import (
     compare_realtys_in_out,
     compare_users_in_out,
@@ -30,6 +38,59 @@ async def test_success_current_user(
     )
 
 
+async def test_success_current_user_from_cache(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    fake_user_1: UserFake,
+    fake_user_update_1: UserFake,
+) -> None:
+    """Тест на получение текущего пользователя из кэша и сброс кэша при обновлении"""
+    hits = user_cache.hits
+    for _ in range(2):
+        response = await client.get(url="/users/me/", headers=auth_access_headers_1)
+        assert response.status_code == 200
+    assert user_cache.hits == hits + 1
+    compare_users_in_out(user_in=fake_user_1, user_out=response.json(), user_id=1)
+
+    response = await client.patch(
+        url="/users/1/",
+        headers=auth_access_headers_1,
+        json=asdict(fake_user_update_1),
+    )
+    assert response.status_code == 200
+    assert len(user_cache) == 0
+
+    response = await client.get(url="/users/me/", headers=auth_access_headers_1)
+    compare_users_in_out(
+        user_in=fake_user_update_1, user_out=response.json(), user_id=1
+    )
+
+
+async def test_success_current_user_token_from_cache(
+    client: AsyncClient,
+    auth_access_headers_1: dict[str, str],
+    auth_refresh_headers_1: dict[str, str],
+) -> None:
+    """Тест на повторное использование проверенного токена и отказ для refresh
+    токена, уже проверенного для другой схемы"""
+    hits, misses = token_cache.hits, token_cache.misses
+    for _ in range(3):
+        response = await client.get(url="/users/me/", headers=auth_access_headers_1)
+        assert response.status_code == 200
+    assert (token_cache.hits, token_cache.misses) == (hits + 2, misses + 1)
+
+    response = await client.post(
+        url="/auth/jwt/refresh", headers=auth_refresh_headers_1
+    )
+    assert response.status_code == 200
+    await make_request_and_check_unauthorized(
+        ac=client,
+        method="get",
+        url="/users/me/",
+        headers=auth_refresh_headers_1,
+    )
+
+
 async def test_error_current_user_unauthorized(
     client: AsyncClient,
 ) -> None:
@@ -147,6 +208,55 @@ async def test_success_get_my_realtys(
         )
 
 
+async def test_success_get_my_realtys_paginated(
+    client: AsyncClient,
+    session: AsyncSession,
+    auth_access_headers_1: dict[str, str],
+    users: list[User],
+    fake_realty_1: RealtyFake,
+) -> None:
+    """Тест на постраничное получение объявлений текущего пользователя с фильтром
+    по активности"""
+    realty_ids: list[int] = []
+    for price in range(1, 6):
+        realty_in = RealtySchemaCreate(
+            **asdict(replace(fake_realty_1, price=price, is_active=price % 2 == 1))
+        )
+        realty = await realty_crud.create(session, realty_in, user_id=users[0].id)
+        realty_ids.append(realty.id)
+
+    response = await client.get(
+        url="/users/me/realtys",
+        params={"limit": 2, "offset": 2},
+        headers=auth_access_headers_1,
+    )
+    assert response.status_code == 200
+    assert response.headers["x-total-count"] == "5"
+    assert [realty["id"] for realty in response.json()] == realty_ids[2:4]
+
+    realtys_out: list[dict[str, Any]] = []
+    params: dict[str, str | int] = {
+        "limit": 2,
+        "is_active": "false",
+        "order_by": "price",
+        "desc_order": "true",
+    }
+    while True:
+        response = await client.get(
+            url="/users/me/realtys",
+            params=params,
+            headers=auth_access_headers_1,
+        )
+        assert response.status_code == 200
+        assert response.headers["x-total-count"] == "2"
+        realtys_out.extend(response.json())
+        if (cursor := response.headers.get("x-next-cursor")) is None:
+            break
+        params["cursor"] = cursor
+
+    assert [realty["price"] for realty in realtys_out] == [4, 2]
+
+
 async def test_error_get_my_realtys_unauthorized(
     client: AsyncClient,
 ) -> None:
@@ -156,3 +266,22 @@ async def test_error_get_my_realtys_unauthorized(
         method="get",
         url="/users/me/realtys",
     )
+
+
+async def test_delete_user_resets_listing_cache(
+    client: AsyncClient,
+    session: AsyncSession,
+    users: list[User],
+    realtys: list[Realty],
+) -> None:
+    """Тест на сброс кэша поиска при удалении пользователя вместе с его
+    объявлениями"""
+    response = await client.get(url="/realtys/")
+    assert realtys[0].id in {realty["id"] for realty in response.json()}
+    version = listing_cache.version
+
+    await user_crud.delete(session, users[0])
+    assert listing_cache.version == version + 1
+
+    response = await client.get(url="/realtys/")
+    assert realtys[0].id not in {realty["id"] for realty in response.json()}